@@ -1,55 +1,130 @@
 """
 运行这个函数，即可根据“例字”文件里的字生成声母/韵母
-更改声母/韵母输出在第45行
+更改声母/韵母输出在第58行
 """
-import tkinter as tk
-from tkinter import filedialog
+import os
 import pandas as pd
-from sort_characters import processing_examples_vowels, processing_examples_consonants
-from openpyxl import load_workbook
-from openpyxl.comments import Comment
+from concurrent.futures import ProcessPoolExecutor
+from sort_characters import processing_examples_vowels, processing_examples_consonants, compile_examples
+from xlsx_writer import StreamingWorkbook, CommentBuilder
 
 
-def extract_rhyme_from_files() -> None:
+# 设置固定的元音文件路径
+EXAMPLE_FILE_PATH = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\例字.xlsx"
+OUTPUT_FILE = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\聲韻表\聲韻表_新生成.xlsx"
+
+DIMENSION_EXTRACTORS = {
+    "韵母": processing_examples_vowels,
+    "声母": processing_examples_consonants,
+}
+
+
+def write_results(combined_results, file_results_dict, output_file) -> None:
     """
-    弹出文件选择对话框，允许用户选择多个文件，提取韵母并保存结果。
+    把声韵结果和批注一次写出：值和批注随行一起写入，不再先 to_excel 再重新打开插批注。
     """
-    # 创建文件选择对话框
-    root = tk.Tk()
-    root.withdraw()  # 不显示主窗口
-    file_paths = filedialog.askopenfilenames(title="选择文件", filetypes=[("TSV Files", "*.tsv")])  # 只选择tsv文件
+    wb = StreamingWorkbook(output_file, author="System")
+    ws = wb.create_sheet(title="Sheet1")
+    comment_builder = CommentBuilder("System")
 
-    if not file_paths:
-        print("没有选择任何文件！")
-        return
+    # 批注所在的列，从第二行开始（第一行是表头）
+    for file_name, comments in file_results_dict.items():
+        column_index = combined_results.columns.get_loc(file_name) + 1  # 获取韵母列的索引（+1 是因为 openpyxl 是 1 基础的）
+        for i, comment in enumerate(comments, start=2):
+            # 去除批注内容的空格，并检查是否为空
+            if pd.notna(comment) and comment.strip():
+                comment_builder.add(i, column_index, comment)
 
-    # 设置固定的元音文件路径
-    vowel_file_path = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\例字.xlsx"
+    ws.append(list(combined_results.columns))
+    for i, values in enumerate(combined_results.itertuples(index=False, name=None), start=2):
+        row = [None if pd.isna(value) else value for value in values]
+        ws.append(row, comment_builder.pop_row(i))
+    wb.save()
 
-    # 读取 '例字.xlsx' 文件，保留例字列
-    example_df = pd.read_excel(vowel_file_path)
 
-    # 创建一个新的 DataFrame 用来存储所有的韵母结果
-    combined_results = example_df[["例字"]].copy()
+def extract_from_file(file_path, example_file_path, dimension=None):
+    """
+    读取一个TSV文件，按例字提取声韵，返回含“声韵”“批注”列的结果表。
+    dimension 可直接指定“声母”“韵母”，为 None 时用下面选定的维度。
+    """
+    print(f"正在处理文件: {file_path}")
 
-    # 保存每个文件的韵母和批注
-    file_results_dict = {}
+    # 读取 .tsv 文件
+    tsv_df = pd.read_csv(file_path, sep='\t', encoding='utf-8')
+
+    if dimension is not None:
+        return DIMENSION_EXTRACTORS[dimension](tsv_df, example_file_path)
+
+    ###############################韵母##########################
+    file_results = processing_examples_vowels(tsv_df, example_file_path)
+    ###############################韵母##########################
+
+    ###############################声母##########################
+    # file_results = processing_examples_consonants(tsv_df, example_file_path)
+    ###############################声母##########################
+
+    return file_results
+
+
+def iter_file_results(file_paths, example_file_path, workers=None, dimension=None):
+    """
+    按选择顺序逐个给出 (文件路径, 结果表)，workers 大于 1 时用多进程并行处理。
+    出错的文件打印文件名后跳过，不影响其他文件。
+    """
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(extract_from_file, path, example_file_path, dimension) for path in file_paths]
+            for file_path, future in zip(file_paths, futures):
+                try:
+                    file_results = future.result()
+                except Exception as e:
+                    print(f"处理文件 {file_path} 时出错: {e}")
+                    continue
+                yield file_path, file_results
+        return
 
     for file_path in file_paths:
         try:
-            print(f"正在处理文件: {file_path}")
+            file_results = extract_from_file(file_path, example_file_path, dimension)
+        except Exception as e:
+            print(f"处理文件 {file_path} 时出错: {e}")
+            continue
+        yield file_path, file_results
+
+
+def extract_rhyme_from_files(file_paths=None, example_file_path=EXAMPLE_FILE_PATH, output_file=OUTPUT_FILE, workers=None,
+                             dimension=None):
+    """
+    提取所选文件的声韵并保存结果。
+    file_paths 为空时弹出文件选择对话框，允许用户选择多个文件；output_file 为 None 时不写文件。
+    workers 大于 1 时各文件并行处理，结果仍按选择顺序合并；dimension 见 extract_from_file。
+
+    返回: 声韵结果表（第一列是例字，其后每个文件一列），没有选择文件时返回 None
+    """
+    if not file_paths:
+        # 创建文件选择对话框
+        import tkinter as tk
+        from tkinter import filedialog
+
+        root = tk.Tk()
+        root.withdraw()  # 不显示主窗口
+        file_paths = filedialog.askopenfilenames(title="选择文件", filetypes=[("TSV Files", "*.tsv")])  # 只选择tsv文件
+
+    if not file_paths:
+        print("没有选择任何文件！")
+        return None
 
-            # 读取 .tsv 文件
-            tsv_df = pd.read_csv(file_path, sep='\t', encoding='utf-8')
+    # 读取 '例字.xlsx' 文件（同一文件只编译一次），保留例字列
+    examples = compile_examples(example_file_path)
 
-            ###############################韵母##########################
-            file_results = processing_examples_vowels(tsv_df, vowel_file_path)
-            ###############################韵母##########################
+    # 创建一个新的 DataFrame 用来存储所有的韵母结果
+    combined_results = pd.DataFrame({"例字": [cell_value for _, cell_value, _ in examples]})
 
-            ###############################声母##########################
-            # file_results = processing_examples_consonants(tsv_df, vowel_file_path)
-            ###############################声母##########################
+    # 保存每个文件的韵母和批注
+    file_results_dict = {}
 
+    for file_path, file_results in iter_file_results(file_paths, example_file_path, workers, dimension):
+        try:
             # 将该文件的韵母列添加到 combined_results 中
             file_name = file_path.split("/")[-1].replace(".tsv", "")
             combined_results[file_name] = file_results['声韵']
@@ -59,29 +134,12 @@ def extract_rhyme_from_files() -> None:
             print(f"处理文件 {file_path} 时出错: {e}")
 
     # 生成最终输出的文件
-    output_file = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\聲韻表\聲韻表_新生成.xlsx"
-    combined_results.to_excel(output_file, index=False, engine='openpyxl')
-    print(f"所有声韵提取结果已保存到：{output_file}")
-
-    # 插入批注
-    wb = load_workbook(output_file)
-    ws = wb.active
-
-    # 假设韵母在 DataFrame 中的列，从第二行开始插入批注
-    for file_name, comments in file_results_dict.items():
-        column_index = combined_results.columns.get_loc(file_name) + 1  # 获取韵母列的索引（+1 是因为 openpyxl 是 1 基础的）
-
-        # 遍历每个韵母单元格，插入批注
-        for i, comment in enumerate(comments, start=2):  # start=2 是因为 Excel 数据从第二行开始
-            # 去除批注内容的空格，并检查是否为空
-            if pd.notna(comment) and comment.strip():  # 如果批注内容非空（去除空格后）
-                cell = ws.cell(row=i, column=column_index)
-                cell.comment = Comment(comment, "System")
+    if output_file is not None:
+        write_results(combined_results, file_results_dict, output_file)
+        print(f"所有声韵提取结果和批注已保存到：{output_file}")
 
-    # 保存 Excel 文件
-    wb.save(output_file)
-    print(f"批注已成功插入并保存到：{output_file}")
+    return combined_results
 
 
 if __name__ == "__main__":
-    extract_rhyme_from_files()
+    extract_rhyme_from_files(workers=os.cpu_count())
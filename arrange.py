@@ -1,48 +1,58 @@
 """
 运行这个函数，即可根据“聲韻”文件里的层级结构按照中古音地位整理所有字
-更改声母/韵母/声调输出在第69、73、77行
-在第304行选择使用“聲韻”文件中的列名，可以自己根据中古音制作层级结构，用“-”隔开即可
-在第305行输入要处理的分区，不同分区用空格隔开，输入“全部”则都处理。
-第17行可以添加模糊音，把对应声韵放在一行内输出
-第203行设置当声韵少于一定比例时，不独立一行输出
+更改声母/韵母/声调输出在第173、177、181行，也可以给 process 的 dimension 传列表，一次输出多个维度
+在第523行选择使用“聲韻”文件中的列名（可以是列表），可以自己根据中古音制作层级结构，用“-”隔开即可
+在第524行输入要处理的分区，不同分区用空格隔开，输入“全部”则都处理。
+第26行的模糊歸類表可以添加模糊音，把对应声韵放在一行内输出
+第414行设置当声韵少于一定比例时，不独立一行输出
 """
 
 import pandas as pd
 import os
-from openpyxl import Workbook
-from openpyxl.comments import Comment
-from gets import get_consonants_from_tsv, get_vowels_from_tsv, get_tones_from_tsv
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from functools import lru_cache
+from gets import parse_tsv, iter_tsv_records, iter_readings, EXTRACTOR_FINGERPRINT
 from collections import defaultdict
-
-from matching import choose_tsv_files
-
-# 聲韻模糊映射：鍵為原聲韻，值為歸類用的主聲韻
-MERGE_MAP = {}
-
-MERGE_MAP.update({k: "kʷ" for k in ["kw", "kᵘ", "kᵛ", "kʋ", "kʷ", "kv"]})
-MERGE_MAP.update({k: "kʰw" for k in ["kʷʰ", "kʰʷ", "kʰᵘ", "kʰᵛ", "kʰʋ", "kʋʰ", "kʰw", "kvʰ"]})
-MERGE_MAP.update({k: "pʰʋ" for k in ["pʰw", "pʰᵘ", "pʰʋ"]})
-MERGE_MAP.update({k: "tʰw" for k in ["tʰᵘ", "tʰw", "tʰʋ"]})
-MERGE_MAP.update({k: "ʔ" for k in ["(ʔ)", "∅", "ʔ", "ˀ"]})
-MERGE_MAP.update({k: "ʋ" for k in ["v", "ʋ", "vʋ", "w"]})
-MERGE_MAP.update({k: "h" for k in ["h", "ɦ", "ɦʰ", "xʱ", "hɦ", "hʱ", "ʰ"]})
-MERGE_MAP.update({k: "hʷ" for k in ["hʷ", "hw", "hʋ", "ɦʋ"]})
-MERGE_MAP.update({k: "x" for k in ["x", "xʱ", "xɣ", "ɣ", "χ"]})
-MERGE_MAP.update({k: "xʷ" for k in ["xv", "xʋ", "xʷ", "xᵊ", "xᶷ"]})
-MERGE_MAP.update({k: "d" for k in ["d", "d̥", "ɗ", "ɗw"]})
-MERGE_MAP.update({k: "dz" for k in ["dz", "d̥z̥"]})
-MERGE_MAP.update({k: "dʑ" for k in ["dʑ", "d̥ʑ̥"]})
-MERGE_MAP.update({k: "fw" for k in ["fʋ", "fw", "fv", "fʰ", "fʱ", "f", "̊f"]})
-MERGE_MAP.update({k: "l" for k in ["l", "l̥", "l̩"]})
-MERGE_MAP.update({k: "m" for k in ["m", "m̥", "m̩", "m͡b"]})
-MERGE_MAP.update({k: "mʷ" for k in ["mʷ", "mw", "mʋ"]})
-MERGE_MAP.update({k: "mʰ" for k in ["mʰ", "mɦ", "mʱ"]})
-MERGE_MAP.update({k: "sʷ" for k in ["sw", "sʋ", "sʷ"]})
-MERGE_MAP.update({k: "tʰ" for k in ["tʰʰ", "tʱ", "tʰ"]})
-MERGE_MAP.update({k: "ŋʷ" for k in ["ŋʷ", "ŋw", "ŋʋ"]})
-MERGE_MAP.update({k: "ŋ" for k in ["ŋ", "ŋ̊", "ŋɡ", "ŋ͡ɡ", "ng", "nɡ"]})
-MERGE_MAP.update({k: "ɡ" for k in ["ɡ", "g", "ɡ̊", "ᵑɡ"]})
-MERGE_MAP.update({k: "b" for k in ["b̥", "ɓw", "ɓ", "ᵐb", "b", "bv"]})
+from collation import DEFAULT_COLLATION
+from merge_classes import MergeClasses
+from xlsx_writer import StreamingWorkbook
+from symbols import SymbolCorpus
+from incremental import AggregateStore, levels_fingerprint
+import profiling
+
+OUTPUT_DIR = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\arrange"
+
+# 聲韻模糊歸類表：每行一類，前面是主聲韻，後面是歸入該類的聲韻；同一聲韻列在多類時以最後一類為準
+MERGE_TABLE = [
+    ("kʷ", ["kw", "kᵘ", "kᵛ", "kʋ", "kʷ", "kv"]),
+    ("kʰw", ["kʷʰ", "kʰʷ", "kʰᵘ", "kʰᵛ", "kʰʋ", "kʋʰ", "kʰw", "kvʰ"]),
+    ("pʰʋ", ["pʰw", "pʰᵘ", "pʰʋ"]),
+    ("tʰw", ["tʰᵘ", "tʰw", "tʰʋ"]),
+    ("ʔ", ["(ʔ)", "∅", "ʔ", "ˀ"]),
+    ("ʋ", ["v", "ʋ", "vʋ", "w"]),
+    ("h", ["h", "ɦ", "ɦʰ", "xʱ", "hɦ", "hʱ", "ʰ"]),
+    ("hʷ", ["hʷ", "hw", "hʋ", "ɦʋ"]),
+    ("x", ["x", "xʱ", "xɣ", "ɣ", "χ"]),
+    ("xʷ", ["xv", "xʋ", "xʷ", "xᵊ", "xᶷ"]),
+    ("d", ["d", "d̥", "ɗ", "ɗw"]),
+    ("dz", ["dz", "d̥z̥"]),
+    ("dʑ", ["dʑ", "d̥ʑ̥"]),
+    ("fw", ["fʋ", "fw", "fv", "fʰ", "fʱ", "f", "̊f"]),
+    ("l", ["l", "l̥", "l̩"]),
+    ("m", ["m", "m̥", "m̩", "m͡b"]),
+    ("mʷ", ["mʷ", "mw", "mʋ"]),
+    ("mʰ", ["mʰ", "mɦ", "mʱ"]),
+    ("sʷ", ["sw", "sʋ", "sʷ"]),
+    ("tʰ", ["tʰʰ", "tʱ", "tʰ"]),
+    ("ŋʷ", ["ŋʷ", "ŋw", "ŋʋ"]),
+    ("ŋ", ["ŋ", "ŋ̊", "ŋɡ", "ŋ͡ɡ", "ng", "nɡ"]),
+    ("ɡ", ["ɡ", "g", "ɡ̊", "ᵑɡ"]),
+    ("b", ["b̥", "ɓw", "ɓ", "ᵐb", "b", "bv"]),
+]
+MERGE_CLASSES = MergeClasses(MERGE_TABLE)
+# 鍵為原聲韻，值為歸類用的主聲韻
+MERGE_MAP = MERGE_CLASSES.mapping
 
 
 def extract_levels(level_df, category_column):
@@ -55,70 +65,285 @@ def extract_levels(level_df, category_column):
     return level_dict, max_level
 
 
-def build_flat_levels(level_dict, max_level):
-    expanded = []
-    for levels, chars in level_dict.items():
-        for char in chars:
-            padded = list(levels) + [None] * (max_level - len(levels))
-            expanded.append(padded + [char])
-    return pd.DataFrame(expanded, columns=[f"level{i + 1}" for i in range(max_level)] + ["char"])
+def build_level_trie(level_dict):
+    """
+    按前缀整理 extract_levels 的叶路径：{层级: {前缀: [叶路径, ...]}}。
+    第 N 级的每个分组就是所有深度不小于 N、前 N 级相同的叶路径，前缀和叶路径都保持首次出现的顺序。
+    """
+    trie = defaultdict(dict)
+    for levels in level_dict:
+        for depth in range(1, len(levels) + 1):
+            trie[depth].setdefault(levels[:depth], []).append(levels)
+    return trie
 
 
-def collect_consonants(tsv_path):
+def aggregate_location(level_dict, phonetic_map):
+    """
+    统计一个文件在每个叶路径下的字：{叶路径: ({子類聲韻: [字, ...]}, 有效字数)}，有效字数为出现在 phonetic_map 中的字数。
+    """
+    aggregate = {}
+    for levels, chars in level_dict.items():
+        cmap = {}
+        count = 0
+        for char in chars:
+            readings = phonetic_map.get(char)
+            if readings is None:
+                continue
+            count += 1
+            for cons, _ in readings:
+                cmap.setdefault(cons, []).append(char)
+        aggregate[levels] = (cmap, count)
+    return aggregate
+
+
+def merge_leaves(aggregate, leaf_paths):
+    """
+    按叶路径的顺序合并一个文件各叶路径的统计（见 aggregate_location），字的顺序与逐字扫描整个分组时相同。
+
+    返回: ({子類聲韻: [字, ...]}, 有效字数)
+    """
+    cmap = {}
+    count = 0
+    for levels in leaf_paths:
+        leaf_cmap, leaf_count = aggregate[levels]
+        count += leaf_count
+        for cons, chars in leaf_cmap.items():
+            if cons in cmap:
+                cmap[cons].extend(chars)
+            else:
+                cmap[cons] = list(chars)
+    return cmap, count
+
+
+def render_cell(cmap, subclasses, notes):
+    """
+    一个文件一个主類的格子：依次合并各子類的字（保序去重），批注为其中多音字的读音。
+
+    返回: (子類, 轄字, 字数, 批注)
+    """
+    chars = []
+    for cons in subclasses:
+        chars.extend(cmap[cons])
+    chars = list(dict.fromkeys(chars))
+    return tuple(subclasses), "".join(chars), len(chars), "\n".join(filter(None, map(notes.get, chars)))
+
+
+def build_location_cells(level_trie, aggregate, notes):
+    """
+    预先算好一个文件在每个分组中每个主類的格子（见 render_cell），write_workbook 只需按主類查表拼行；
+    增量模式下随统计结果一起缓存，没有改动的文件不必重新合并、重新生成格子。
+    子類按本文件中出现的顺序排列；几个文件合在一起时 write_workbook 会按全组首次出现的顺序核对。
+
+    返回: {层级: {前缀: (有效字数, {主類: 格子})}}
+    """
+    merge_map = MERGE_CLASSES.mapping
+    cells = {}
+    for level_idx, level_groups in level_trie.items():
+        level_cells = cells[level_idx] = {}
+        for level_key, leaf_paths in level_groups.items():
+            cmap, total = merge_leaves(aggregate, leaf_paths)
+            subclasses = {}
+            for cons in cmap:
+                subclasses.setdefault(merge_map.get(cons, cons), []).append(cons)
+            level_cells[level_key] = (total, {
+                main_cons: render_cell(cmap, members, notes) for main_cons, members in subclasses.items()
+            })
+    return cells
+
+
+def build_reading_notes(phonetic_maps):
+    """
+    为每个文件中有多个读音的字预先生成批注行“字：讀音, 讀音”：{地點: {字: 批注行}}。
+    """
+    notes = {}
+    for name, phonetic_map in phonetic_maps.items():
+        notes[name] = {
+            char: f"{char}：{', '.join(p[1] for p in phonetics)}"
+            for char, phonetics in phonetic_map.items()
+            if len(phonetics) > 1
+        }
+    return notes
+
+
+def selected_dimension(dimension=None):
+    """
+    dimension 可直接指定“声母”“韵母”“声调”，为 None 时用下面选定的维度。
+    """
     ########################聲母#################################
-    # df = get_consonants_from_tsv(tsv_path, char_list="all")
+    # column = "声母"
     ########################聲母#################################
 
     ########################韻母#################################
-    df = get_vowels_from_tsv(tsv_path, char_list="all")
+    column = "韵母"
     ########################韻母#################################
 
     ########################聲調#################################
-    # df = get_tones_from_tsv(tsv_path, char_list="all")
+    # column = "声调"
     ########################聲調#################################
 
-    phonetic_map = defaultdict(list)
-    for _, row in df.iterrows():
-        phonetic_map[row["汉字"]].append((row["声韵"], row["音标"]))
-    return phonetic_map
+    if dimension is not None:
+        column = dimension
+    return column
 
 
-def process(tsv_paths, excel_path, category_column):
-    # print(tsv_paths)
-    raw_df = pd.read_excel(excel_path, sheet_name="層級")
-    level_df = raw_df[['單字', category_column]].dropna()
-    print(f"级别数据框创建完成，去除缺失值后共有 {len(level_df)} 行。")
-    level_dict, max_level = extract_levels(level_df, category_column)
-    flat_df = build_flat_levels(level_dict, max_level)
+def collect_dimensions(tsv_path, streaming=False, columns=("韵母",), batch_size=5000):
+    """
+    一次解析TSV，为每个维度各建立 {汉字: [(声韵, 音标), ...]} 的聲韻對應表：{维度: 聲韻對應表}。
+    streaming 为 True 时分块读取TSV，逐批记录直接并入对应表，不在内存中保留整张解析表。
+    """
+    # 一次解析出声母、韵母、声调，各维度共用
+    if streaming:
+        records = iter_tsv_records(tsv_path)
+    else:
+        records = parse_tsv(tsv_path, char_list="all").itertuples(index=False, name=None)
+
+    phonetic_maps = {column: defaultdict(list) for column in columns}
+    records = iter(records)
+    while batch := list(islice(records, batch_size)):
+        for column, phonetic_map in phonetic_maps.items():
+            for char, reading, phonetic in iter_readings(batch, column):
+                phonetic_map[char].append((reading, phonetic))
+    return phonetic_maps
+
+
+def collect_consonants(tsv_path, streaming=False, dimension=None):
+    """
+    建立 {汉字: [(声韵, 音标), ...]} 的聲韻對應表，dimension 见 selected_dimension，streaming 见 collect_dimensions。
+    """
+    column = selected_dimension(dimension)
+    return collect_dimensions(tsv_path, streaming, (column,))[column]
+
+
+@profiling.profiled("解析TSV", items=len)
+def load_phonetic_maps(tsv_names, tsv_paths, workers=None, streaming=False, columns=("韵母",), corpus=None):
+    """
+    为每个非 "_" 的文件建立各维度的聲韻對應表（见 collect_dimensions），workers 大于 1 时用多进程并行解析。
+    给出 corpus（symbols.SymbolCorpus）时，每张表一到手就编成整数数组，所有地点共用同一份字和声韵字符串。
+
+    返回: 按 tsv_names 顺序排列的 {地點: {维度: 聲韻對應表}}；出错的文件会打印文件名并以空表代替，不影响其他文件
+    """
+    jobs = [(name, path) for name, path in zip(tsv_names, tsv_paths) if name != "_"]
+    phonetic_maps = {}
+    if corpus is not None:
+        store = lambda maps: {column: corpus.compact(phonetic_map) for column, phonetic_map in maps.items()}
+    else:
+        store = lambda maps: maps
+    empty = lambda: store({column: defaultdict(list) for column in columns})
+
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(collect_dimensions, path, streaming, columns) for _, path in jobs]
+            for (name, path), future in zip(jobs, futures):
+                try:
+                    phonetic_maps[name] = store(future.result())
+                except Exception as e:
+                    print(f"处理文件 {path} 时出错: {e}")
+                    phonetic_maps[name] = empty()
+        return phonetic_maps
+
+    for name, path in jobs:
+        try:
+            phonetic_maps[name] = store(collect_dimensions(path, streaming, columns))
+        except Exception as e:
+            print(f"处理文件 {path} 时出错: {e}")
+            phonetic_maps[name] = empty()
+    return phonetic_maps
+
+
+def load_location_aggregates(outputs, tsv_names, tsv_paths, workers=None, streaming=False):
+    """
+    为每个输出、每个非 "_" 的文件按叶路径统计聲韻（见 aggregate_location），生成多音字批注（见 build_reading_notes）
+    和各分组的格子（见 build_location_cells）。每个文件只解析一次，所有输出共用。
+
+    outputs: {(分类列, 维度): (叶路径字典, 层级树, 增量缓存)}；增量缓存（incremental.AggregateStore）为 None 时不用缓存，
+             否则未改动的文件直接读回上次的结果（连同格子），只解析新增或改动过的文件
+
+    返回: {(分类列, 维度): ({地點: 各叶路径的统计}, {地點: {字: 批注行}}, {地點: 各分组的格子})}，地點按 tsv_names 顺序排列
+    """
+    jobs = [(name, path) for name, path in zip(tsv_names, tsv_paths) if name != "_"]
+    results = {key: {} for key in outputs}
+    stale = {key: set() for key in outputs}
+    for key, (_, _, cache) in outputs.items():
+        for name, path in jobs:
+            cached = cache.lookup(path) if cache is not None else None
+            if cached is None:
+                stale[key].add(name)
+            else:
+                results[key][name] = cached
+        if cache is not None:
+            print(f"增量模式（{key[0]}，{key[1]}）：{len(jobs) - len(stale[key])} 个文件未改动，{len(stale[key])} 个文件需要解析。")
+
+    pending = [(name, path) for name, path in jobs if any(name in names for names in stale.values())]
+    columns = list(dict.fromkeys(column for _, column in outputs))
+    phonetic_maps = load_phonetic_maps(
+        [name for name, _ in pending], [path for _, path in pending], workers, streaming, columns, SymbolCorpus()
+    )
+    with profiling.stage("统计地点", items=len(pending)):
+        for name, path in pending:
+            maps = phonetic_maps[name]
+            notes = {}  # 同一维度的批注各分类列共用
+            for key, (level_dict, level_trie, cache) in outputs.items():
+                if name not in stale[key]:
+                    continue
+                column = key[1]
+                phonetic_map = maps[column]
+                if column not in notes:
+                    notes[column] = build_reading_notes({name: phonetic_map})[name]
+                aggregate = aggregate_location(level_dict, phonetic_map)
+                cells = build_location_cells(level_trie, aggregate, notes[column])
+                results[key][name] = (aggregate, notes[column], cells)
+                # 解析出错的文件得到空表，不写入缓存，下次再试
+                if cache is not None and len(phonetic_map):
+                    cache.store(path, results[key][name])
+
+    for _, _, cache in outputs.values():
+        if cache is not None:
+            cache.prune()
+            cache.save()
+
+    names = [name for name in tsv_names if name != "_"]
+    return {
+        key: tuple({name: entries[name][part] for name in names} for part in range(3))
+        for key, entries in results.items()
+    }
 
-    output_dir = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\arrange"
-    os.makedirs(output_dir, exist_ok=True)
-    save_path = os.path.join(output_dir, f"{category_column}.xlsx")
 
-    wb = Workbook()
-    wb.remove(wb.active)
+@lru_cache(maxsize=8)
+def _read_level_sheet(excel_path, mtime_ns):
+    return pd.read_excel(excel_path, sheet_name="層級")
 
-    # 允許 tsv_paths 中包含 "_" 作為空欄佔位符
-    real_paths = [p for p in tsv_paths if p != "_"]
-    placeholder_names = ["_"] * tsv_paths.count("_")
-    real_names = [os.path.splitext(os.path.basename(p))[0] for p in real_paths]
-    tsv_names = []
 
-    # 重建 tsv_names，對應原始順序（保留 "_" 的位置）
-    for p in tsv_paths:
-        if p == "_":
-            tsv_names.append("_")
-        else:
-            tsv_names.append(os.path.splitext(os.path.basename(p))[0])
+def read_level_sheet(excel_path):
+    """
+    读取“聲韻”文件的“層級”工作表，文件未修改时复用上次读取的结果（批量运行时各任务共用）。
+    """
+    return _read_level_sheet(os.path.abspath(excel_path), os.stat(excel_path).st_mtime_ns)
 
-    print(f"识别到的TSV文件（含佔位）: {tsv_names}")
 
-    # 只為非 "_" 的檔案建立聲韻對應表
-    phonetic_maps = {
-        name: collect_consonants(path)
-        for name, path in zip(tsv_names, tsv_paths)
-        if name != "_"
-    }
+def load_levels(excel_path, category_column):
+    """
+    读取一个分类列的层级结构，返回 (叶路径字典, 最大层数, 有效行数)。
+    """
+    raw_df = read_level_sheet(excel_path)
+    level_df = raw_df[['單字', category_column]].dropna()
+    level_dict, max_level = extract_levels(level_df, category_column)
+    return dict(level_dict), max_level, len(level_df)
+
+
+def write_workbook(save_path, tsv_names, max_level, level_trie, location_aggregates, reading_notes,
+                   collation=DEFAULT_COLLATION, location_cells=None):
+    """
+    按层级逐级输出一个表格：每级一个工作表，每个分组按主類聲韻一行，小占比的主類合并成一行。
+    location_cells 为各文件预先算好的格子（见 build_location_cells），不给时在这里现算。
+    """
+    wb = StreamingWorkbook(save_path)
+    file_names = [name for name in tsv_names if name != "_"]
+    class_roots = MERGE_CLASSES.roots
+    if location_cells is None:
+        location_cells = {
+            name: build_location_cells(level_trie, location_aggregates[name], reading_notes[name])
+            for name in file_names
+        }
 
     for level_idx in range(1, max_level + 1):
         sheet = wb.create_sheet(title=f"第{level_idx}級")
@@ -132,201 +357,175 @@ def process(tsv_paths, excel_path, category_column):
                 # header += [f"{name}", f"{name}_聲韻", f"{name}_轄字"]
         sheet.append(header)
 
-        subset = flat_df.dropna(subset=[f"level{level_idx}"])
-        level_groups = defaultdict(list)
-        for _, row in subset.iterrows():
-            key = tuple(row[c] for c in level_cols)
-            level_groups[key].append(row["char"])
+        level_groups = level_trie[level_idx]
         print(f"第 {level_idx} 级的分组完成，共有 {len(level_groups)} 个唯一组。")
 
-        for level_key, chars in level_groups.items():
+        for level_key, leaf_paths in level_groups.items():
             if not tsv_names:
                 sheet.append(list(level_key) + ["", ""])
                 continue
-            all_consonants = set()
-            tsv_consonant_map = {}
-            merged_chars_by_file = {}
-            merged_class_map = defaultdict(list)
-
-            # Step 0: 每个文件内的有效字数（出现在 phonetic_maps 中）
-            total_chars_per_file = {}
-            for name in tsv_names:
-                if name == "_":
-                    continue
-                total_chars_per_file[name] = sum(1 for char in chars if char in phonetic_maps[name])
-
-            # Step 1: 遍历所有 tsv，按子類聲韻统计数据，同时建立主類→子類映射
-            for name in tsv_names:
-                if name == "_":
-                    continue  # 跳過佔位符，不查表
-                cmap = defaultdict(list)
-                for char in chars:
-                    if char in phonetic_maps[name]:
-                        for cons, _ in phonetic_maps[name][char]:
-                            main_cons = MERGE_MAP.get(cons, cons)
-                            cmap[cons].append(char)
-                            all_consonants.add(main_cons)
-                            if cons not in merged_class_map[main_cons]:
-                                merged_class_map[main_cons].append(cons)
-                tsv_consonant_map[name] = cmap
-
-            # Step 2: 按主類聲韻排序（字典序）
-            # 自定义排序列表
-            custom_order = [
-                'p', 'pʰ', 't', 'tʰ', 'k', 'kʰ', 'f', 'ʋ', 'ɸ', 'h',
-                'x', 'l', 'n', 'm', 'ŋ', 'ɲ', 'ȵ', 'j', 'z', 's', 'ʃ',
-                'ʂ', 'ɕ', 'θ', 'ɬ', 'b', 'd', 'g', 'ʒ', 'ʑ', 'ʐ'
-                'ʦ', 'ʧ', 'ʨ', 'tʂ', 'tɹ', 'tr', 'tθ', 'dz', 'dʑ', 'dʐ', 'dʒ'
-                'ʦʰ', 'ʧʰ', 'ʨʰ', 'tʂʰ', 'tɹʰ', 'trʰ', 'tθʰ', 'dzʰ', 'dʑʰ', 'dʐʰ', 'dʒʰ'
-                'ʔ', 'a', 'ia', 'ua', 'ᴀ', 'ɑ', 'æ', 'ɐ', 'iɐ', 'uɐ',
-                'ə', 'iə', 'uə', 'ᴇ', 'ɛ', 'œ', 'iɛ', 'uɛ', 'ɜ', 'ɞ', 'ʌ',
-                'ɔ', 'iɔ', 'uɔ', 'o', 'io', 'uo', 'ɤ', 'ɵ', 'ɘ',
-                'ø', 'iø', 'e', 'ie', 'ʊ', 'u', 'ɯ', 'y', 'i', 'ɿ', 'ʮ',
-                '陰平', '陰平甲', '陰平乙', '陽平', '陽平甲', '陽平乙', '陰上', '陰上甲', '陰上乙',
-                '陽上', '陽上甲', '陽上乙', '陰去', '陰去甲', '陰去乙', '陽去', '陽去甲', '陽去乙',
-                '陰入', '上陰入', '下陰入', '陽入', '上陽入', '下陽入', '變調', '變調1', '變調2', '輕聲',
-            ]
-
-            # 按照 custom_order 排序 all_consonants
-            sorted_consonants = sorted(all_consonants,
-                                       key=lambda cons: [
-                                           custom_order.index(cons[i:i + 2]) if cons[i:i + 2] in custom_order else
-                                           custom_order.index(cons[i]) if cons[i] in custom_order else float('inf')
-                                           for i in range(len(cons))
-                                       ])
+            merged_class_map = defaultdict(dict)  # 主類 -> 按本组中首次出现顺序的子類（决定轄字顺序），只记有成员的主類
+
+            with profiling.stage("合并分组", items=1):
+                # Step 0: 取出每个文件在该组的有效字数和各主類的格子
+                group_cells = {name: location_cells[name][level_idx][level_key] for name in file_names}
+
+                # Step 1: 遍历所有 tsv，建立主類→子類映射
+                all_consonants = set()
+                for name in file_names:
+                    for main_cons, cell in group_cells[name][1].items():
+                        all_consonants.add(main_cons)
+                        if main_cons in class_roots:
+                            merged_class_map[main_cons].update(dict.fromkeys(cell[0]))
+
+            # Step 2: 按主類聲韻排序（自定义排序列表，见 collation）
+            with profiling.stage("排序", items=len(all_consonants)):
+                sorted_consonants = collation.sort(all_consonants)
 
             # print(sorted_consonants)
             # sorted_consonants = sorted(all_consonants)
-            small_class_cache = []
+            small_class_cache = {name: [] for name in file_names}  # 文件 -> [(主類, 格子), ...]
 
-            # Step 3: 逐主類聲韻生成一行数据
+            # Step 3: 逐主類聲韻生成一行数据（流式写出，批注须随该行一起写入）
             for cons in sorted_consonants:
-                row = list(level_key)
-                merged_chars_by_file = {}  # 必须每轮清零
-                small_class_files = set()  # 标记哪些文件要合并
-                for name in tsv_names:
-                    if name == "_":
+                with profiling.stage("生成行") as timer:
+                    merged_cons_list = merged_class_map.get(cons)
+                    row_data = []
+                    row_comments = {}
+                    small_cells = {}  # 标记哪些文件要合并
+                    for i, name in enumerate(tsv_names):
+                        if name == "_":
+                            row_data += ["", ""]
+                            continue
+                        total, cells = group_cells[name]
+                        cell = cells.get(cons)
+                        if cell is None:
+                            row_data += ["", ""]
+                            continue
+
+                        # 子類须按全组首次出现的顺序合并；与本文件的顺序不同时（少见）重新生成格子
+                        if merged_cons_list is not None and len(cell[0]) > 1:
+                            present = [c for c in merged_cons_list if c in cell[0]]
+                            if tuple(present) != cell[0]:
+                                cmap = merge_leaves(location_aggregates[name], leaf_paths)[0]
+                                cell = render_cell(cmap, present, reading_notes[name])
+
+                        # 小于0.07的声韵不独立显示
+                        if cell[2] / total < 0.07:
+                            small_cells[name] = cell
+                            row_data += ["", ""]
+                            continue
+
+                        # ✅ 写入主行（部分文件写入）
+                        row_data += [cons, cell[1]]
+                        if cell[3]:
+                            row_comments[len(level_cols) + i * 2 + 2] = cell[3]
+
+                    for name, cell in small_cells.items():
+                        small_class_cache[name].append((cons, cell))
+                    # ✅ 如果整行都是空的（該主類所有文件都為小主類），跳過
+                    if all(value == "" for value in row_data):
                         continue
-                    cmap = tsv_consonant_map.get(name, {})
-                    merged_cons_list = merged_class_map.get(cons, [cons])
-                    actual_cons_present = [c for c in merged_cons_list if c in cmap]
+                    sheet.append(list(level_key) + row_data, row_comments)
+                    timer.count()
+
+            # Step 4: 合併寫入所有小占比主類（若有）
+            if any(small_class_cache.values()):
+                with profiling.stage("生成行", items=1):
+                    row_data = []
+                    row_comments = {}
+                    for i, name in enumerate(tsv_names):
+                        entries = small_class_cache.get(name) if name != "_" else None
+                        if not entries:
+                            row_data += ["", ""]
+                            continue
+                        row_data.append("\n".join(cons for cons, _ in entries))
+                        row_data.append("\n".join(cell[1] for _, cell in entries))
+                        # ✅ 批註
+                        notes = "\n".join(cell[3] for _, cell in entries if cell[3])
+                        if notes:
+                            row_comments[len(level_cols) + i * 2 + 2] = notes
+                    sheet.append(list(level_key) + row_data, row_comments)
+    with profiling.stage("保存"):
+        wb.save()
+    print(f"✅ 已導出：{save_path}")
 
-                    if not actual_cons_present:
-                        continue
 
-                    merged_chars = []
-                    for c in actual_cons_present:
-                        merged_chars.extend(cmap[c])
-                    merged_chars = list(dict.fromkeys(merged_chars))  # 保序去重
-
-                    total = total_chars_per_file.get(name, 1)  # 避免除以 0
-                    proportion = len(merged_chars) / total
-                    # 小于0.07的声韵不独立显示
-                    if proportion < 0.07:
-                        small_class_files.add(name)
-
-                    merged_chars_by_file[name] = merged_chars
-
-                # 判断是否整行合并或部分写入
-                if small_class_files:
-                    trimmed_merged_map = {
-                        name: merged_chars_by_file[name]
-                        for name in small_class_files
-                        if name in merged_chars_by_file
-                    }
-                    small_class_cache.append((cons, trimmed_merged_map))
-
-                # ✅ 写入主行（部分文件写入）
-                row_data = []
-                for name in tsv_names:
-                    if name == "_":
-                        row_data += ["", ""]
-                    elif name in merged_chars_by_file and name not in small_class_files:
-                        chars = merged_chars_by_file[name]
-                        row_data += [cons, "".join(chars)]
-                    else:
-                        row_data += ["", ""]
-                # ✅ 如果整行都是空的（該主類所有文件都為小主類），跳過
-                if all(cell == "" for cell in row_data):
-                    continue
-                row += row_data
-                sheet.append(row)
+def process(tsv_paths, excel_path, category_column, workers=None, streaming=False, collation=DEFAULT_COLLATION,
+            output_dir=OUTPUT_DIR, dimension=None, incremental=False):
+    """
+    category_column、dimension 都可以是列表：每个TSV只解析一次，每个分类列的层级只建一次，
+    一次输出所有 分类列 × 维度 的表格。只有一个维度时输出“分类列.xlsx”，多个维度时输出“分类列_维度.xlsx”。
+    incremental 为 True 时在 output_dir 下保存各地点的统计结果和格子，下次只重新解析、重新生成新增或改动过的TSV（见 incremental）。
 
-                # Step 4: 添加批註
-                col_base = len(level_cols)
-                for i, name in enumerate(tsv_names):
-                    if name == "_" or name in small_class_files:
-                        continue
-                    if name in merged_chars_by_file:
-                        for char in merged_chars_by_file[name]:
-                            phonetics = phonetic_maps[name].get(char, [])
-                            if len(phonetics) > 1:
-                                readings = ", ".join(p[1] for p in phonetics)
-                                new_text = f"{char}：{readings}"
-                                target_col = col_base + i * 2 + 2
-                                cell = sheet.cell(row=sheet.max_row, column=target_col)
-                                if cell.comment:
-                                    cell.comment = Comment(cell.comment.text + f"\n{new_text}", "不羈")
-                                else:
-                                    cell.comment = Comment(new_text, "不羈")
-
-            # Step 5: 合併寫入所有小占比主類（若有）
-            if small_class_cache:
-                row = list(level_key)
-                row_data = []
-
-                for name in tsv_names:
-                    if name == "_":
-                        row_data += ["", ""]
-                        continue
+    返回: 输出的文件路径列表
+    """
+    # print(tsv_paths)
+    categories = [category_column] if isinstance(category_column, str) else list(category_column)
+    dimensions = list(dimension) if isinstance(dimension, (list, tuple)) else [dimension]
+    columns = list(dict.fromkeys(selected_dimension(d) for d in dimensions))
+    os.makedirs(output_dir, exist_ok=True)
 
-                    cons_label_lines = []
-                    cons_char_lines = []
+    # 每个分类列只读一次层级、建一次层级树；增量模式下每个 分类列 × 维度 各有一份缓存
+    levels = {}
+    level_tries = {}
+    outputs = {}
+    with profiling.stage("读取层级") as timer:
+        for category in categories:
+            for column in columns:
+                cache = None
+                if incremental:
+                    cache = AggregateStore(
+                        os.path.join(output_dir, ".arrange_cache", f"{category}_{column}"),
+                        levels_fingerprint(excel_path, category, column, (EXTRACTOR_FINGERPRINT, MERGE_TABLE)),
+                    )
+                if category not in levels:
+                    cached_levels = cache.levels if cache is not None else None
+                    levels[category] = cached_levels or load_levels(excel_path, category)
+                    level_tries[category] = build_level_trie(levels[category][0])
+                    print(f"级别数据框创建完成，去除缺失值后共有 {levels[category][2]} 行。")
+                    timer.count(levels[category][2])
+                if cache is not None and cache.levels is None:
+                    cache.set_levels(levels[category])
+                outputs[(category, column)] = (levels[category][0], level_tries[category], cache)
 
-                    for cons, merged_map in small_class_cache:
-                        if name in merged_map:
-                            cons_label_lines.append(cons)
-                            cons_char_lines.append("".join(merged_map[name]))
+    # 允許 tsv_paths 中包含 "_" 作為空欄佔位符
+    tsv_names = []
 
-                    if cons_label_lines:
-                        row_data.append("\n".join(cons_label_lines))
-                        row_data.append("\n".join(cons_char_lines))
-                    else:
-                        row_data += ["", ""]
+    # 重建 tsv_names，對應原始順序（保留 "_" 的位置）
+    for p in tsv_paths:
+        if p == "_":
+            tsv_names.append("_")
+        else:
+            tsv_names.append(os.path.splitext(os.path.basename(p))[0])
 
-                row += row_data
-                sheet.append(row)
+    print(f"识别到的TSV文件（含佔位）: {tsv_names}")
 
-                # ✅ 批註
-                col_base = len(level_cols)
-                for i, name in enumerate(tsv_names):
-                    if name == "_":
-                        continue
-                    for cons, merged_map in small_class_cache:
-                        if name in merged_map:
-                            chars = merged_map[name]
-                            for char in chars:
-                                phonetics = phonetic_maps[name].get(char, [])
-                                if len(phonetics) > 1:
-                                    readings = ", ".join(p[1] for p in phonetics)
-                                    new_text = f"{char}：{readings}"
-                                    target_col = col_base + i * 2 + 2
-                                    cell = sheet.cell(row=sheet.max_row, column=target_col)
-                                    if cell.comment:
-                                        cell.comment = Comment(cell.comment.text + f"\n{new_text}", "不羈")
-                                    else:
-                                        cell.comment = Comment(new_text, "不羈")
-    wb.save(save_path)
-    print(f"✅ 已導出：{save_path}")
+    # 只為非 "_" 的檔案统计；每个叶路径只逐字统计一次，各级分组由叶路径的统计结果合并而来
+    results = load_location_aggregates(outputs, tsv_names, tsv_paths, workers, streaming)
+
+    saved = []
+    for (category, column), (location_aggregates, reading_notes, location_cells) in results.items():
+        file_name = f"{category}.xlsx" if len(columns) == 1 else f"{category}_{column}.xlsx"
+        save_path = os.path.join(output_dir, file_name)
+        max_level = levels[category][1]
+        write_workbook(save_path, tsv_names, max_level, level_tries[category],
+                       location_aggregates, reading_notes, collation, location_cells)
+        saved.append(save_path)
+    return saved
 
 
 # -------------------------------
 if __name__ == "__main__":
+    from matching import choose_tsv_files
+
     EXCEL_PATH = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\聲韻.xlsx"
     CATEGORY_COLUMN = "韻母簡"  # 改完记得改上面调用的函数
     tsv_files, *_ = choose_tsv_files("嶺南 嶺西 廣中")  # 嶺南 嶺西 廣中 嶺東 閩 湘贛 浙南 兩浙
 
     if tsv_files:
-        process(tsv_files, EXCEL_PATH, CATEGORY_COLUMN)
+        process(tsv_files, EXCEL_PATH, CATEGORY_COLUMN, workers=os.cpu_count())
+        if profiling.ENABLED:
+            print(profiling.summary())
     else:
         print("⚠️ 未選擇任何TSV文件。")
@@ -0,0 +1,236 @@
+"""
+无界面批量运行：按任务清单（JSON）依次执行 arrange / according_to_examples / distance，不弹出文件对话框，也不用写死的路径。
+
+    python batch.py jobs.json [--only 任务名 ...] [--profile 统计.json]
+
+清单格式（相对路径以清单文件所在目录为准，任务中没写的键沿用顶层的设置）：
+
+    {
+        "excel_path": "聲韻.xlsx",
+        "abbreviation_path": "漢字音典字表檔案（長期更新）.csv",
+        "example_path": "例字.xlsx",
+        "workers": 8,
+        "jobs": [
+            {"name": "嶺南韻母", "task": "arrange", "tsv": ["data/*.tsv"], "partition": "嶺南 嶺西",
+             "category_columns": ["韻母簡", "聲母"], "dimension": ["声母", "韵母", "声调"], "output_dir": "out/arrange",
+             "incremental": true},
+            {"name": "聲母表", "task": "examples", "tsv": ["data/*.tsv"], "dimension": "声母",
+             "output_dir": "out/聲韻表"},
+            {"name": "地點距離", "task": "distance", "tsv": ["data/*.tsv"], "category_columns": ["韻母簡"],
+             "dimension": "韵母", "output_dir": "out/距離", "k": 5}
+        ]
+    }
+
+excel_path、abbreviation_path、example_path 没有默认值：arrange、distance 任务需要前两个，
+examples 任务需要 example_path，分区不是“全部”时还需要 abbreviation_path。
+examples 任务可以用 output_file 指定输出文件（相对清单所在目录），不写时输出到 output_dir 下的“聲韻表_任务名.xlsx”。
+分类列、维度在读入清单时就检查，写错的任务不会运行到一半才出错。
+
+同一进程内各任务共用已读入的参考数据（“聲韻”层级表、簡稱索引、例字表），不会每个任务重新读取。
+arrange 任务的 dimension 可以是列表，各分类列、各维度在一次运行中输出，每个TSV只解析一次。
+distance 任务为每个分类列输出一个工作簿：各地点两两之间的余弦距离、JS距离、对应距离，以及每个地点最近的 k 个地点。
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+import arrange
+import distance
+import profiling
+import according_to_examples
+from matching import choose_tsv_files
+
+DEFAULTS = {
+    "task": "arrange",
+    "partition": "全部",
+    "dimension": None,
+    "workers": None,
+    "streaming": False,
+    "incremental": False,
+    "excel_path": None,
+    "abbreviation_path": None,
+    "example_path": None,
+    "output_dir": ".",
+    "output_file": None,
+}
+PATH_KEYS = ("excel_path", "abbreviation_path", "example_path", "output_dir", "output_file")
+DIMENSIONS = ("声母", "韵母", "声调")
+PATH_NAMES = {
+    "excel_path": "excel_path（“聲韻”文件）",
+    "abbreviation_path": "abbreviation_path（簡稱索引）",
+    "example_path": "example_path（例字表）",
+}
+
+
+def load_manifest(manifest_path):
+    """
+    读取任务清单，返回补全了默认值、路径已解析为绝对路径的任务列表。
+    """
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    shared = {key: value for key, value in manifest.items() if key != "jobs"}
+
+    jobs = []
+    for i, job in enumerate(manifest.get("jobs", []), start=1):
+        settings = {**DEFAULTS, **shared, **job}
+        settings.setdefault("name", f"job{i}")
+        for key in PATH_KEYS:
+            if settings[key] is not None:
+                settings[key] = os.path.join(base_dir, settings[key])
+        patterns = settings.get("tsv", [])
+        if isinstance(patterns, str):
+            patterns = [patterns]
+        settings["tsv"] = [os.path.join(base_dir, pattern) for pattern in patterns]
+        validate_job(settings)
+        jobs.append(settings)
+    return jobs
+
+
+def validate_job(job):
+    """
+    检查任务类型、分类列和维度，有误时抛出 ValueError；分类列统一整理成 category_columns 列表。
+    """
+    name, task, dimension = job["name"], job["task"], job["dimension"]
+    if task not in TASKS:
+        raise ValueError(f"任务 {name} 的 task 应为 {list(TASKS)} 之一，而不是 {task!r}")
+
+    if task in ("arrange", "distance"):
+        categories = job.get("category_columns") or job.get("category_column")
+        if isinstance(categories, str):
+            categories = [categories]
+        if not categories or not all(isinstance(category, str) and category for category in categories):
+            raise ValueError(f"任务 {name} 需要 category_columns（“聲韻”文件中的分类列名）")
+        job["category_columns"] = list(categories)
+
+    # 只有 arrange 可以一次输出多个维度；None 表示用各模块中选定的维度
+    supported = list(according_to_examples.DIMENSION_EXTRACTORS) if task == "examples" else list(DIMENSIONS)
+    if task == "arrange" and isinstance(dimension, list):
+        valid = bool(dimension) and all(d in supported for d in dimension)
+    else:
+        valid = dimension is None or dimension in supported
+    if not valid:
+        raise ValueError(f"任务 {name}（{task}）的 dimension 只能是 {supported} 之一，而不是 {dimension!r}")
+
+
+def require_path(job, key):
+    if not job[key]:
+        raise ValueError(f"{job['task']} 任务需要 {PATH_NAMES[key]}")
+
+
+def expand_tsv(patterns):
+    """
+    展开TSV通配符（支持 **），按匹配顺序去重。
+    """
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern, recursive=True)))
+    return list(dict.fromkeys(paths))
+
+
+def run_arrange(job, tsv_paths):
+    require_path(job, "excel_path")
+    require_path(job, "abbreviation_path")
+    sorted_paths, *_ = choose_tsv_files(job["partition"], tsv_paths, job["abbreviation_path"])
+    if not sorted_paths:
+        print(f"⚠️ 任务 {job['name']} 在分区 {job['partition']} 中没有匹配到TSV文件。")
+        return
+    arrange.process(
+        sorted_paths, job["excel_path"], job["category_columns"],
+        workers=job["workers"], streaming=job["streaming"],
+        output_dir=job["output_dir"], dimension=job["dimension"], incremental=job["incremental"],
+    )
+
+
+def run_examples(job, tsv_paths):
+    require_path(job, "example_path")
+    if job["partition"] != "全部":
+        require_path(job, "abbreviation_path")
+        sorted_paths, *_ = choose_tsv_files(job["partition"], tsv_paths, job["abbreviation_path"])
+        tsv_paths = [path for path in sorted_paths if path != "_"]
+    if not tsv_paths:
+        print(f"⚠️ 任务 {job['name']} 在分区 {job['partition']} 中没有匹配到TSV文件。")
+        return
+    output_file = job["output_file"] or os.path.join(job["output_dir"], f"聲韻表_{job['name']}.xlsx")
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    according_to_examples.extract_rhyme_from_files(
+        tsv_paths, job["example_path"], output_file,
+        workers=job["workers"], dimension=job["dimension"],
+    )
+
+
+def run_distance(job, tsv_paths):
+    require_path(job, "excel_path")
+    require_path(job, "abbreviation_path")
+    sorted_paths, *_ = choose_tsv_files(job["partition"], tsv_paths, job["abbreviation_path"])
+    if not sorted_paths:
+        print(f"⚠️ 任务 {job['name']} 在分区 {job['partition']} 中没有匹配到TSV文件。")
+        return
+    distance.process(
+        sorted_paths, job["excel_path"], job["category_columns"],
+        workers=job["workers"], streaming=job["streaming"], dimension=job["dimension"],
+        output_dir=job["output_dir"], k=job.get("k", 5),
+    )
+
+
+TASKS = {
+    "arrange": run_arrange,
+    "examples": run_examples,
+    "distance": run_distance,
+}
+
+
+def run_jobs(jobs, only=None):
+    """
+    依次执行任务，单个任务出错时打印错误并继续下一个。
+
+    返回: 出错的任务名列表
+    """
+    failed = []
+    for job in jobs:
+        if only and job["name"] not in only:
+            continue
+        print(f"=== 任务 {job['name']}（{job['task']}）===")
+        try:
+            tsv_paths = expand_tsv(job["tsv"])
+            print(f"匹配到 {len(tsv_paths)} 个TSV文件")
+            if not tsv_paths:
+                print(f"⚠️ 任务 {job['name']} 没有匹配到TSV文件，跳过。")
+                continue
+            TASKS[job["task"]](job, tsv_paths)
+        except Exception as e:
+            print(f"任务 {job['name']} 出错: {e}")
+            failed.append(job["name"])
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按任务清单批量整理声韵")
+    parser.add_argument("manifest", help="任务清单（JSON）")
+    parser.add_argument("--only", nargs="*", help="只运行这些名字的任务")
+    parser.add_argument("--profile", help="统计各阶段耗时和内存，汇总表打印出来并写入此 JSON 文件")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        profiling.enable()
+    try:
+        jobs = load_manifest(args.manifest)
+    except ValueError as e:
+        print(f"任务清单 {args.manifest} 有误: {e}")
+        return 1
+    failed = run_jobs(jobs, args.only)
+    if args.profile:
+        print(profiling.summary())
+        profiling.save_json(args.profile)
+    if failed:
+        print(f"以下任务出错：{failed}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
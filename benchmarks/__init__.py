@@ -0,0 +1,3 @@
+"""
+性能基准：在仓库根目录下以 python -m benchmarks.<模块> 运行。
+"""
@@ -0,0 +1,146 @@
+"""
+确定性的合成方言语料
+先给每个字随机分配一个中古音地位（聲類、攝、等、呼、調類），再为每个地点生成一套音变规则
+（聲類 → 声母、攝等呼 → 韵母、調類 → 声调，带少量合并和例外），由此写出各地点的 TSV，
+以及带“層級”工作表的“聲韻”文件。同一组参数（地点数、字数、种子）生成的文件完全相同。
+"""
+
+import os
+import random
+
+import pandas as pd
+
+INITIAL_CLASSES = ["幫", "滂", "並", "明", "端", "透", "定", "泥", "來", "精", "清", "從", "心", "邪",
+                   "知", "徹", "澄", "莊", "初", "崇", "生", "章", "昌", "船", "書", "禪", "日",
+                   "見", "溪", "群", "疑", "曉", "匣", "影", "云", "以"]
+RHYME_GROUPS = ["果", "假", "遇", "蟹", "止", "效", "流", "咸", "深", "山", "臻", "宕", "江", "曾", "梗", "通"]
+DIVISIONS = ["一", "二", "三", "四"]
+ROUNDINGS = ["開", "合"]
+TONE_CLASSES = ["陰平", "陽平", "陰上", "陽上", "陰去", "陽去", "陰入", "陽入"]
+
+INITIALS = ["p", "pʰ", "b", "m", "f", "v", "t", "tʰ", "d", "n", "l", "ts", "tsʰ", "dz", "s", "z",
+            "tʃ", "tʃʰ", "ʃ", "tɕ", "tɕʰ", "ɕ", "ʨ", "ʥ", "k", "kʰ", "ɡ", "ŋ", "x", "h", "ɦ", "kʷ", "kʰw",
+            "j", "w", "ʔ", "", "∅"]
+NUCLEI = ["a", "ɑ", "ɐ", "e", "ɛ", "ə", "o", "ɔ", "u", "i", "y", "ɿ", "ʅ", "ø", "œ", "ɵ", "ʊ", "ɪ", "ã", "ẽ", "õ"]
+MEDIALS = ["", "", "", "i", "u", "y", "j", "w"]
+CODAS = ["", "", "i", "u", "m", "n", "ŋ", "p", "t", "k", "ʔ"]
+CHECKED_CODAS = ["p", "t", "k", "ʔ"]
+TONE_DIGITS = ["1", "2", "3", "4", "5", "6", "7", "8", "9", "55", "33", "21", "35", "13", "1a", "7b"]
+
+# 这两个字的读音决定 gets 使用哪套调类映射，必须出现在每个TSV中
+TONE_PROBE_CHARS = {"時": ("禪", "止", "三", "開", "陽平"), "窮": ("群", "通", "三", "合", "陽平")}
+
+
+def build_characters(n_chars, rng):
+    """
+    生成 n_chars 个字及其中古音地位：{字: (聲類, 攝, 等, 呼, 調類)}。
+    """
+    characters = dict(TONE_PROBE_CHARS)
+    code = 0x4e00
+    while len(characters) < n_chars:
+        char = chr(code)
+        code += 1
+        if char in characters:
+            continue
+        characters[char] = (
+            rng.choice(INITIAL_CLASSES),
+            rng.choice(RHYME_GROUPS),
+            rng.choice(DIVISIONS),
+            rng.choice(ROUNDINGS),
+            rng.choice(TONE_CLASSES),
+        )
+    return characters
+
+
+def build_location(rng):
+    """
+    生成一个地点的音变规则：聲類、韻類、調類各自映射到具体的声母、韵母、声调。
+    """
+    initials = {name: rng.choice(INITIALS) for name in INITIAL_CLASSES}
+    finals = {}
+    for group in RHYME_GROUPS:
+        for division in DIVISIONS:
+            for rounding in ROUNDINGS:
+                medial = "u" if rounding == "合" and rng.random() < 0.6 else rng.choice(MEDIALS)
+                finals[(group, division, rounding)] = (medial + rng.choice(NUCLEI), rng.choice(CODAS))
+    tones = {name: rng.choice(TONE_DIGITS) for name in TONE_CLASSES}
+    return {
+        "initials": initials,
+        "finals": finals,
+        "tones": tones,
+        "exception_rate": rng.uniform(0.02, 0.08),
+        "multi_rate": rng.uniform(0.05, 0.15),
+    }
+
+
+def _syllable(status, location, rng):
+    initial_class, group, division, rounding, tone_class = status
+    initial = location["initials"][initial_class]
+    nucleus, coda = location["finals"][(group, division, rounding)]
+    if tone_class.endswith("入") and coda not in CHECKED_CODAS:
+        coda = rng.choice(CHECKED_CODAS)
+    if rng.random() < location["exception_rate"]:
+        # 例外读音：换一个声母或韵腹
+        if rng.random() < 0.5:
+            initial = rng.choice(INITIALS)
+        else:
+            nucleus = rng.choice(NUCLEI)
+    if initial == "" and rng.random() < 0.3:
+        initial = "∅"
+    return f"{initial}{nucleus}{coda}{location['tones'][tone_class]}"
+
+
+def write_location_tsv(path, characters, location, rng):
+    rows = []
+    for char, status in characters.items():
+        reading = _syllable(status, location, rng)
+        if rng.random() < location["multi_rate"]:
+            # 一字多音：一半写在同一格里用 “/” 隔开，一半另起一行
+            other = _syllable(status, build_location(rng) if rng.random() < 0.3 else location, rng)
+            if rng.random() < 0.5:
+                rows.append((char, f"{reading}/{other}"))
+            else:
+                rows.append((char, reading))
+                rows.append((char, other))
+        else:
+            rows.append((char, reading))
+    pd.DataFrame(rows, columns=["#漢字", "音標"]).to_csv(path, sep="\t", index=False)
+
+
+def write_levels(path, characters):
+    """
+    写出“聲韻”文件的“層級”工作表：單字、韻母簡（攝-等-呼）、聲母（聲類）、聲調（調類）。
+    """
+    rows = [
+        (char, f"{group}-{division}-{rounding}", initial_class, tone_class)
+        for char, (initial_class, group, division, rounding, tone_class) in characters.items()
+    ]
+    level_df = pd.DataFrame(rows, columns=["單字", "韻母簡", "聲母", "聲調"])
+    with pd.ExcelWriter(path) as writer:
+        level_df.to_excel(writer, sheet_name="層級", index=False)
+
+
+def generate_corpus(out_dir, n_locations, n_chars=3000, seed=0):
+    """
+    在 out_dir 下按字数和种子分目录生成 n_locations 个地点的TSV和“聲韻.xlsx”，已存在的文件直接复用。
+
+    返回: (TSV路径列表, 聲韻.xlsx 路径)
+    """
+    out_dir = os.path.join(out_dir, f"chars{n_chars}-seed{seed}")
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    characters = build_characters(n_chars, rng)
+
+    excel_path = os.path.join(out_dir, "聲韻.xlsx")
+    if not os.path.exists(excel_path):
+        write_levels(excel_path, characters)
+
+    tsv_paths = []
+    for i in range(n_locations):
+        path = os.path.join(out_dir, f"點{i:03d}.tsv")
+        if not os.path.exists(path):
+            # 每个地点用独立的种子，生成第 i 个地点不依赖前面生成了多少个
+            location_rng = random.Random(f"{seed}-{i}")
+            write_location_tsv(path, characters, build_location(location_rng), location_rng)
+        tsv_paths.append(path)
+    return tsv_paths, excel_path
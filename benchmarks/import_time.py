@@ -0,0 +1,75 @@
+"""
+导入耗时预算：在新的解释器里逐个导入入口模块，扣除 pandas 本身的导入时间后检查是否超出预算，
+并确认 tkinter、opencc、hanziconv、openpyxl 这类只在特定功能里才用到的依赖没有在导入时被加载。
+
+    python -m benchmarks.import_time [--budget-ms 150] [--repeat 5]
+
+超出预算或加载了不该加载的依赖时以非零状态退出。
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ENTRY_MODULES = ["gets", "arrange", "matching", "according_to_examples", "caculate_Frequency", "batch", "distance"]
+# 必需的第三方依赖，导入时间不计入本仓库的预算
+BASELINE_MODULES = ["pandas", "numpy"]
+LAZY_MODULES = ["tkinter", "opencc", "hanziconv", "openpyxl"]
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {lazy!r} if name in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(module, repeat=5):
+    """
+    在新进程中导入模块 repeat 次，返回 (最短耗时毫秒, 被提前加载的可选依赖)。
+    """
+    best = None
+    loaded = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_MODULES)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        )
+        elapsed, _, names = result.stdout.strip().partition(" ")
+        elapsed_ms = float(elapsed) * 1000
+        best = elapsed_ms if best is None else min(best, elapsed_ms)
+        loaded = [name for name in names.split(",") if name]
+    return best, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查入口模块的导入耗时预算")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="扣除 pandas 后每个模块允许的导入耗时（毫秒）")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    baseline, _ = measure(", ".join(BASELINE_MODULES), args.repeat)
+    print(f"基准（{'、'.join(BASELINE_MODULES)}）: {baseline:.0f} ms")
+
+    failed = False
+    for module in ENTRY_MODULES:
+        elapsed, loaded = measure(module, args.repeat)
+        own = max(0.0, elapsed - baseline)
+        status = "OK"
+        if own > args.budget_ms:
+            status = "超出预算"
+            failed = True
+        if loaded:
+            status = f"提前加载了 {','.join(loaded)}"
+            failed = True
+        print(f"{module:<24}{elapsed:>8.0f} ms  本仓库 {own:>6.0f} ms  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+性能基准：在 1、10、100、500 个合成地点上分别计时各提取器、arrange 整理流程（含增量模式下改动一个TSV后重跑）
+和频率统计，结果写成 JSON，可以与其他提交的结果对比。
+
+    python -m benchmarks.run [--sizes 1 10 100 500] [--chars 3000] [--output 结果.json] [--compare 旧结果.json]
+
+结果默认写到 benchmarks/bench.json（已在 .gitignore 中），不会在当前目录留下文件。
+
+语料由 benchmarks.corpus 生成并缓存在 --corpus-dir 下；TSV解析缓存指向临时目录，每次运行都从冷缓存开始。
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import arrange
+import gets
+import tsv_cache
+from benchmarks.corpus import generate_corpus
+from caculate_Frequency import compute_frequencies
+from collation import DEFAULT_COLLATION
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(REPO_DIR, "benchmarks", "bench.json")
+DEFAULT_SIZES = [1, 10, 100, 500]
+ENGINES = ["loop", "vectorized"]
+
+
+@contextlib.contextmanager
+def quiet():
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def timed(func, repeat=1):
+    """
+    运行 func repeat 次，返回 (最短耗时秒数, 最后一次的返回值)。
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with quiet():
+            result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def frequency_input(tables):
+    """
+    把各地点解析好的表按韵母归字，排成 compute_frequencies 需要的 xx_聲韻 / xx_轄字 成对列。
+    """
+    columns = {}
+    for name, table in tables.items():
+        view = gets.get_vowels_from_table(table)
+        grouped = view.groupby("声韵", sort=False)["汉字"].agg("".join)
+        columns[f"{name}_聲韻"] = pd.Series(grouped.index, dtype=object)
+        columns[f"{name}_轄字"] = pd.Series(grouped.to_numpy(), dtype=object)
+    return pd.DataFrame(columns)
+
+
+def bench_size(tsv_paths, excel_path, repeat, work_dir):
+    names = [os.path.splitext(os.path.basename(path))[0] for path in tsv_paths]
+    results = {}
+
+    # 各提取器：不走缓存，完整解析所有文件
+    tables = {}
+    for engine in ENGINES:
+        results[f"parse_{engine}"], parsed = timed(
+            lambda: [gets.parse_tsv(path, use_cache=False, engine=engine) for path in tsv_paths], repeat)
+        tables = dict(zip(names, parsed))
+    for dimension, getter in [("vowels", gets.get_vowels_from_table),
+                              ("consonants", gets.get_consonants_from_table),
+                              ("tones", gets.get_tones_from_table)]:
+        results[f"view_{dimension}"], _ = timed(lambda: [getter(table) for table in tables.values()], repeat)
+    results["stream_records"], _ = timed(
+        lambda: [sum(1 for _ in gets.iter_tsv_records(path)) for path in tsv_paths], repeat)
+
+    # arrange：第一次冷缓存，第二次命中解析缓存
+    cache_dir = os.path.join(work_dir, "cache")
+    output_dir = os.path.join(work_dir, "arrange")
+    tsv_cache.clear(cache_dir)
+    original_cache_dir = tsv_cache.CACHE_DIR
+    tsv_cache.CACHE_DIR = cache_dir
+    try:
+        run = lambda: arrange.process(tsv_paths, excel_path, "韻母簡", output_dir=output_dir)
+        results["arrange_cold"], _ = timed(run)
+        results["arrange_warm"], _ = timed(run, repeat)
+
+        # 增量模式：先整理一遍，之后每次改动一个TSV（追加一行）再重跑，只计重跑的耗时
+        edit_dir = os.path.join(work_dir, "edit")
+        os.makedirs(edit_dir, exist_ok=True)
+        edit_paths = [shutil.copy(path, edit_dir) for path in tsv_paths]
+        output_dir = os.path.join(work_dir, "arrange_incremental")
+        run = lambda: arrange.process(edit_paths, excel_path, "韻母簡", output_dir=output_dir, incremental=True)
+        results["arrange_incremental_cold"], _ = timed(run)
+        edit = edit_paths[len(edit_paths) // 2]
+        edit_seconds = []
+        for _ in range(repeat):
+            with open(edit, "a", encoding="utf-8") as f:
+                f.write("一\tzzz5\n")
+            edit_seconds.append(timed(run)[0])
+        results["arrange_incremental_edit"] = min(edit_seconds)
+    finally:
+        tsv_cache.CACHE_DIR = original_cache_dir
+
+    # 频率统计
+    df_data = frequency_input(tables)
+    results["frequency"], _ = timed(lambda: compute_frequencies(df_data, names, DEFAULT_COLLATION), repeat)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """
+    逐项打印与旧结果的耗时比值（新/旧），小于 1 表示变快。
+    """
+    print(f"\n与 {previous.get('commit')} 对比（新/旧）：")
+    for size, stages in current["results"].items():
+        old_stages = previous.get("results", {}).get(size, {})
+        for stage, seconds in stages.items():
+            if stage in old_stages and old_stages[stage] > 0:
+                print(f"{size:>5} 点  {stage:<26}{seconds / old_stages[stage]:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成语料上的性能基准")
+    parser.add_argument("--sizes", type=int, nargs="*", default=DEFAULT_SIZES, help="地点数")
+    parser.add_argument("--chars", type=int, default=3000, help="每个地点的字数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="每项重复次数，取最短")
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "process_phonology_bench"))
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--compare", help="与之对比的旧结果 JSON")
+    args = parser.parse_args(argv)
+
+    tsv_paths, excel_path = generate_corpus(args.corpus_dir, max(args.sizes), args.chars, args.seed)
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "chars": args.chars,
+        "seed": args.seed,
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sorted(args.sizes):
+            results = bench_size(tsv_paths[:size], excel_path, args.repeat, work_dir)
+            report["results"][str(size)] = results
+            print(f"{size} 个地点：")
+            for stage, seconds in results.items():
+                print(f"  {stage:<26}{seconds:>9.3f} s")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到：{args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
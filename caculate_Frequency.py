@@ -1,136 +1,171 @@
 """
 运行这个函数，即可根据“统计”文件计算声韵频率
 需要做的是:把声韵、例字复制到统计里（第一行是xx_聲韻 xx_轄字)
-然后在该程序第26行设置要跳过的列数（即第一个地名出现之前有多少列）
-第77行选择排序的依据（根据“聲韻”里的“順序”工作表的列名进行排序）
+然后在该程序第105行设置要跳过的列数（即第一个地名出现之前有多少列）
+第120行选择排序的依据（根据“聲韻”里的“順序”工作表的列名进行排序）
+最后按频率算出各地点之间的余弦距离、JS距离和最近的地点，另存到 distance_path
 """
 
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.comments import Comment
-from hanziconv import HanziConv
 
+from collation import Collation
+from xlsx_writer import CommentBuilder
 from matching import process_and_sort_locations
 
 # === 1. 檔案路徑 ===
 input_path = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\统计.xlsx"
 output_path = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\声韵分析\聲韻頻率統計.xlsx"
+distance_path = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\声韵分析\地點間距離.xlsx"
 # abbreviation_path = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\漢字音典字表檔案（長期更新）.csv"
 aspiration_path = r"C:\Users\joengzaang\myfiles\杂文件\声韵处理\聲韻.xlsx"
 
-# === 2. 讀取資料 ===
-df = pd.read_excel(input_path)
-# 忽略多少列在这里更改，例如忽略3列下面就填3
-df_data = df.iloc[:, 1:]
-
-# === 3. 地點順序 ===
-original_locations = []
-for i in range(0, len(df_data.columns), 2):
-    col_name = df_data.columns[i]
-    if isinstance(col_name, str) and col_name.endswith('聲韻'):
-        loc_name = col_name.rsplit('_', 1)[0]
-        original_locations.append(loc_name)
-
-# === 4. 地點與分區排序處理 ===
-locations, partitions, matched_locations, unmatched_locations, partition_map = process_and_sort_locations(original_locations)
-
-
-# === 5. 統計頻率 ===
-location_freqs = {}
-location_comments = {}
-overall_counter = defaultdict(int)
-overall_total = 0
-
-for loc in locations:
-    if loc == "__SEP__":
-        continue
-    rhyme_col = f"{loc}_聲韻"
-    char_col = f"{loc}_轄字"
-    if rhyme_col in df_data.columns and char_col in df_data.columns:
-        sub_df = df_data[[rhyme_col, char_col]].dropna()
-        rhyme_counts = defaultdict(int)
-        rhyme_chars = defaultdict(str)
-        total_chars = 0
-
-        for _, row in sub_df.iterrows():
-            rhyme = row[rhyme_col]
-            chars = str(row[char_col])
-            count = len(chars)
-            total_chars += count
-            rhyme_counts[rhyme] += count
-            rhyme_chars[rhyme] += chars
-            overall_counter[rhyme] += count
-            overall_total += count
-
-        freq_percent = {k: round(v / total_chars * 100, 1) for k, v in rhyme_counts.items()}
-        location_freqs[loc] = freq_percent
-        location_comments[loc] = rhyme_chars
-
-
-# === 6. 整理預計表 ===
-all_rhymes = sorted(set(r for freqs in location_freqs.values() for r in freqs))
-# print(all_rhymes)
-
-# 按順序排序 all_rhymes
-aspiration_df = pd.read_excel(aspiration_path, sheet_name="順序")
-rhyme_order = aspiration_df["送氣"].dropna().tolist()
-
-# 保證順序唯一並保留原順序
-seen = set()
-rhyme_order_unique = [r for r in rhyme_order if not (r in seen or seen.add(r))]
-
-all_rhymes = [r for r in rhyme_order_unique if r in all_rhymes] + [r for r in all_rhymes if r not in rhyme_order_unique]
-print("最終聲韻排序：", all_rhymes)
-
-
-freq_table = pd.DataFrame(index=all_rhymes)
-
-cols = {}
-for loc in locations:
-    if loc == "__SEP__":
-        cols[loc] = pd.Series([''] * len(all_rhymes), index=all_rhymes)
-    else:
-        cols[loc] = pd.Series([location_freqs.get(loc, {}).get(r, 0.0) for r in all_rhymes], index=all_rhymes)
-freq_table = pd.concat(cols, axis=1)
-
-# === 7. 總頻率 ===
-overall_freq = {k: round(v / overall_total * 100, 1) for k, v in overall_counter.items()}
-freq_table['總頻率'] = [overall_freq.get(r, 0.0) for r in all_rhymes]
-# freq_table.sort_values(by='總頻率', ascending=False, inplace=True)
-
-# === 8. 格式化 ===
-freq_table_percent = freq_table.apply(lambda col: col.map(lambda x: f"{x:.1f}%" if isinstance(x, float) and x > 0 else ""))
-
-# === 9. 寫入 Excel 並加入分區 ===
-wb = Workbook()
-ws = wb.active
-ws.title = "聲韻頻率"
-
-headers = ["聲韻"] + locations + ["總頻率"]
-region_row = ["分區"] + partitions + [""]
-
-ws.append(region_row)
-ws.append(headers)
-
-for r_idx, (rhyme, row) in enumerate(freq_table_percent.iterrows(), start=3):
-    ws.cell(row=r_idx, column=1, value=rhyme)
-    for c_idx, loc in enumerate(locations, start=2):
-        val = row[loc] if loc in row else ""
-        ws.cell(row=r_idx, column=c_idx, value=val)
-    ws.cell(row=r_idx, column=1 + len(locations) + 1, value=row['總頻率'])
-
-# === 10. 加入批評 ===
-for r_idx, rhyme in enumerate(freq_table_percent.index, start=3):
-    for c_idx, loc in enumerate(locations, start=2):
-        if loc == "__SEP__":
-            continue
-        cell = ws.cell(row=r_idx, column=c_idx)
-        comment_text = location_comments.get(loc, {}).get(rhyme, "")
-        if comment_text:
-            cell.comment = Comment(comment_text, "系統")
-
-wb.save(output_path)
-print(f"已輸出至：{output_path}")
 
+def to_long_form(df_data, locations):
+    """
+    把每個地點的 xx_聲韻 / xx_轄字 兩列一次攤成長表：地點、聲韻、轄字、字數。
+    兩列都有值的格子才計入，同一地點內保持原來的行順序。
+    """
+    pairs = [
+        loc for loc in dict.fromkeys(locations)
+        if loc != "__SEP__" and f"{loc}_聲韻" in df_data.columns and f"{loc}_轄字" in df_data.columns
+    ]
+    rhymes = df_data[[f"{loc}_聲韻" for loc in pairs]].to_numpy(dtype=object).T
+    chars = df_data[[f"{loc}_轄字" for loc in pairs]].to_numpy(dtype=object).T
+    mask = pd.notna(rhymes) & pd.notna(chars)
+    loc_idx, _ = np.nonzero(mask)
+
+    long_df = pd.DataFrame({
+        "地點": np.array(pairs, dtype=object)[loc_idx],
+        "聲韻": rhymes[mask],
+        "轄字": [str(c) for c in chars[mask]],
+    })
+    long_df["字數"] = long_df["轄字"].str.len()
+    return long_df
+
+
+def _percent(counts, total):
+    return round(counts / total * 100, 1)
+
+
+def compute_frequencies(df_data, locations, order=None):
+    """
+    統計每個地點各聲韻所轄字數佔該地點總字數的百分比。
+
+    df_data: 以 xx_聲韻、xx_轄字 成對排列的表
+    locations: 地點順序，"__SEP__" 輸出為空列
+    order: 聲韻排序用的 Collation，為 None 時按字符排序
+
+    返回: (頻率表（聲韻 × 地點，最後一列為總頻率）, {地點: {聲韻: 轄字}})
+    """
+    long_df = to_long_form(df_data, locations)
+    counts = long_df.groupby(["地點", "聲韻"], sort=False)["字數"].sum()
+
+    # 轄字先按格收集成列表，最後各 join 一次
+    char_lists = {}
+    for loc, rhyme, chars in zip(long_df["地點"].tolist(), long_df["聲韻"].tolist(), long_df["轄字"].tolist()):
+        char_lists.setdefault(loc, {}).setdefault(rhyme, []).append(chars)
+    location_comments = {
+        loc: {rhyme: "".join(chars) for rhyme, chars in rhyme_chars.items()}
+        for loc, rhyme_chars in char_lists.items()
+    }
+
+    all_rhymes = sorted(set(counts.index.get_level_values("聲韻")))
+    if order is not None:
+        all_rhymes = order.order(all_rhymes)
+
+    # 字數矩陣（聲韻 × 地點）除以各地點總字數；沒有資料的格子記 0.0
+    columns = list(dict.fromkeys(locations))
+    present = [loc for loc in columns if loc != "__SEP__"]
+    count_table = counts.unstack("地點").reindex(index=all_rhymes, columns=present)
+    location_totals = long_df.groupby("地點", sort=False)["字數"].sum().reindex(present)
+    percent = count_table.to_numpy(dtype=float) / location_totals.to_numpy(dtype=float) * 100
+    freq_values = np.zeros(percent.shape)
+    has_value = ~np.isnan(percent)
+    freq_values[has_value] = [round(x, 1) for x in percent[has_value].tolist()]
+
+    freq_table = pd.DataFrame(freq_values, index=all_rhymes, columns=present).reindex(columns=columns)
+    if "__SEP__" in freq_table.columns:
+        freq_table["__SEP__"] = ''
+
+    # 總頻率
+    overall_counts = counts.groupby(level="聲韻", sort=False).sum()
+    overall_total = float(long_df["字數"].sum())
+    freq_table['總頻率'] = [
+        _percent(float(overall_counts[r]), overall_total) if r in overall_counts.index else 0.0
+        for r in all_rhymes
+    ]
+    return freq_table, location_comments
+
+
+def main():
+    # === 2. 讀取資料 ===
+    df = pd.read_excel(input_path)
+    # 忽略多少列在这里更改，例如忽略3列下面就填3
+    df_data = df.iloc[:, 1:]
+
+    # === 3. 地點順序 ===
+    original_locations = []
+    for i in range(0, len(df_data.columns), 2):
+        col_name = df_data.columns[i]
+        if isinstance(col_name, str) and col_name.endswith('聲韻'):
+            loc_name = col_name.rsplit('_', 1)[0]
+            original_locations.append(loc_name)
+
+    # === 4. 地點與分區排序處理 ===
+    locations, partitions, matched_locations, unmatched_locations, partition_map = process_and_sort_locations(original_locations)
+
+    # === 5. 統計頻率 ===
+    # 按順序排序聲韻（“順序”工作表中沒有的排在後面）
+    rhyme_collation = Collation.from_excel(aspiration_path, "送氣")
+    freq_table, location_comments = compute_frequencies(df_data, locations, rhyme_collation)
+    print("最終聲韻排序：", list(freq_table.index))
+
+    # === 6. 格式化 ===
+    freq_table_percent = freq_table.apply(lambda col: col.map(lambda x: f"{x:.1f}%" if isinstance(x, float) and x > 0 else ""))
+
+    # === 7. 寫入 Excel 並加入分區 ===
+    from openpyxl import Workbook
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "聲韻頻率"
+
+    headers = ["聲韻"] + locations + ["總頻率"]
+    region_row = ["分區"] + partitions + [""]
+
+    ws.append(region_row)
+    ws.append(headers)
+
+    for r_idx, (rhyme, row) in enumerate(freq_table_percent.iterrows(), start=3):
+        ws.cell(row=r_idx, column=1, value=rhyme)
+        for c_idx, loc in enumerate(locations, start=2):
+            val = row[loc] if loc in row else ""
+            ws.cell(row=r_idx, column=c_idx, value=val)
+        ws.cell(row=r_idx, column=1 + len(locations) + 1, value=row['總頻率'])
+
+    # === 8. 加入批評 ===
+    comment_builder = CommentBuilder("系統")
+    for r_idx, rhyme in enumerate(freq_table_percent.index, start=3):
+        for c_idx, loc in enumerate(locations, start=2):
+            if loc == "__SEP__":
+                continue
+            comment_builder.add(r_idx, c_idx, location_comments.get(loc, {}).get(rhyme, ""))
+    comment_builder.apply(ws)
+
+    wb.save(output_path)
+    print(f"已輸出至：{output_path}")
+
+    # === 9. 地點間距離 ===
+    import distance
+
+    loc_names, _, matrix = distance.phone_matrix(freq_table)
+    distances = {
+        "余弦距离": distance.cosine_distances(matrix),
+        "JS距离": distance.jensen_shannon_distances(matrix),
+    }
+    distance.write_distances(distance_path, distances, loc_names)
+
+
+if __name__ == "__main__":
+    main()
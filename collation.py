@@ -0,0 +1,64 @@
+"""
+聲韻排序
+把排序列表（下面写死的 DEFAULT_ORDER，或“聲韻.xlsx”里“順序”工作表的某一列）编译成 {符号: 名次}，
+并缓存每个聲韻的排序键，排序成千上万个分组时不必重复查找。
+"""
+
+DEFAULT_ORDER = [
+        'p', 'pʰ', 't', 'tʰ', 'k', 'kʰ', 'f', 'ʋ', 'ɸ', 'h',
+        'x', 'l', 'n', 'm', 'ŋ', 'ɲ', 'ȵ', 'j', 'z', 's', 'ʃ',
+        'ʂ', 'ɕ', 'θ', 'ɬ', 'b', 'd', 'g', 'ʒ', 'ʑ', 'ʐ',
+        'ʦ', 'ʧ', 'ʨ', 'tʂ', 'tɹ', 'tr', 'tθ', 'dz', 'dʑ', 'dʐ', 'dʒ',
+        'ʦʰ', 'ʧʰ', 'ʨʰ', 'tʂʰ', 'tɹʰ', 'trʰ', 'tθʰ', 'dzʰ', 'dʑʰ', 'dʐʰ', 'dʒʰ',
+        'ʔ', 'a', 'ia', 'ua', 'ᴀ', 'ɑ', 'æ', 'ɐ', 'iɐ', 'uɐ',
+        'ə', 'iə', 'uə', 'ᴇ', 'ɛ', 'œ', 'iɛ', 'uɛ', 'ɜ', 'ɞ', 'ʌ',
+        'ɔ', 'iɔ', 'uɔ', 'o', 'io', 'uo', 'ɤ', 'ɵ', 'ɘ',
+        'ø', 'iø', 'e', 'ie', 'ʊ', 'u', 'ɯ', 'y', 'i', 'ɿ', 'ʮ',
+        '陰平', '陰平甲', '陰平乙', '陽平', '陽平甲', '陽平乙', '陰上', '陰上甲', '陰上乙',
+        '陽上', '陽上甲', '陽上乙', '陰去', '陰去甲', '陰去乙', '陽去', '陽去甲', '陽去乙',
+        '陰入', '上陰入', '下陰入', '陽入', '上陽入', '下陽入', '變調', '變調1', '變調2', '輕聲',
+]
+
+
+class Collation:
+    def __init__(self, order):
+        self.rank = {}
+        for i, symbol in enumerate(order):
+            self.rank.setdefault(symbol, i)  # 重复出现时以第一次为准
+        self._keys = {}
+
+    @classmethod
+    def from_excel(cls, excel_path, column, sheet_name="順序"):
+        import pandas as pd
+
+        order_df = pd.read_excel(excel_path, sheet_name=sheet_name)
+        return cls(order_df[column].dropna().tolist())
+
+    def sort_key(self, symbol):
+        """
+        逐字符取名次，优先匹配两个字符的符号（如 pʰ、iɐ），列表中没有的排在最后。
+        """
+        key = self._keys.get(symbol)
+        if key is None:
+            rank = self.rank
+            key = [
+                rank[symbol[i:i + 2]] if symbol[i:i + 2] in rank else rank.get(symbol[i], float('inf'))
+                for i in range(len(symbol))
+            ]
+            self._keys[symbol] = key
+        return key
+
+    def sort(self, symbols):
+        return sorted(symbols, key=self.sort_key)
+
+    def order(self, symbols):
+        """
+        整个符号匹配：列表中有的按列表顺序排在前面，其余保持原来的顺序排在后面。
+        """
+        symbols = list(symbols)
+        present = set(symbols)
+        ordered = [symbol for symbol in self.rank if symbol in present]
+        return ordered + [symbol for symbol in symbols if symbol not in self.rank]
+
+
+DEFAULT_COLLATION = Collation(DEFAULT_ORDER)
@@ -0,0 +1,289 @@
+"""
+方言点之间的距离
+把各地点的声韵频率排成 地点 × 声韵 的 NumPy 矩阵，一次算出两两之间的余弦距离、Jensen–Shannon 距离，
+或按 arrange 的层级分类比较各地点的对应声韵（Hamming 距离），再给出每个地点最近的若干个地点。
+process 从TSV文件直接算出三种距离，写成一个工作簿：每种距离一个 地点 × 地点 的工作表，外加“最近地點”工作表。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import arrange
+import profiling
+from symbols import LocationReadings, SymbolCorpus
+from xlsx_writer import StreamingWorkbook
+
+# 频率表中不是地点的列（分区佔位、未匹配分隔、总频率）
+NON_LOCATION_COLUMNS = {"_", "__", "__SEP__", "總頻率"}
+
+
+def phone_matrix(freq_table):
+    """
+    caculate_Frequency.compute_frequencies 的频率表（声韵 × 地点）转成 地点 × 声韵 的矩阵。
+
+    返回: (地点列表, 声韵列表, 矩阵)
+    """
+    locations = [col for col in freq_table.columns if col not in NON_LOCATION_COLUMNS]
+    matrix = freq_table[locations].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    return locations, list(freq_table.index), matrix.to_numpy(dtype=float).T
+
+
+def cosine_distances(matrix):
+    """
+    两两余弦距离 1 - cos；全零的行与其他行的距离记为 1。
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    unit = np.divide(matrix, norms, out=np.zeros_like(matrix, dtype=float), where=norms > 0)
+    distances = 1.0 - unit @ unit.T
+    np.clip(distances, 0.0, 1.0, out=distances)
+    empty = norms[:, 0] == 0
+    distances[empty, :] = 1.0
+    distances[:, empty] = 1.0
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+def _xlogx(values):
+    return np.where(values > 0, values * np.log2(np.where(values > 0, values, 1.0)), 0.0)
+
+
+def jensen_shannon_distances(matrix, chunk_elements=1 << 18):
+    """
+    两两 Jensen–Shannon 距离（以 2 为底的 JS 散度开平方，取值 0～1）。
+    每行先归一化成分布，混合分布 m = (p_i + p_j) / 2 的 Σ m·log2(m) 对一块行与其后所有行整块算出，
+    只算上三角再镜像；每块约 chunk_elements 个元素，内存与地点数的平方无关。
+    """
+    totals = matrix.sum(axis=1, keepdims=True)
+    p = np.divide(matrix, totals, out=np.zeros_like(matrix, dtype=float), where=totals > 0)
+    neg_entropy = _xlogx(p).sum(axis=1)
+    half = p / 2
+    tiny = np.finfo(float).tiny  # log2(0 + tiny) 有限，0 乘上去仍是 0，不必另做掩码
+
+    n, k = p.shape
+    mixed = np.empty((n, n))
+    step = max(1, chunk_elements // max(n * k, 1))
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        block = half[start:stop, None, :] + half[None, start:, :]
+        terms = np.log2(block + tiny)
+        np.multiply(block, terms, out=terms)
+        sums = terms.sum(axis=2)
+        mixed[start:stop, start:] = sums
+        mixed[start:, start:stop] = sums.T
+
+    divergence = 0.5 * (neg_entropy[:, None] + neg_entropy[None, :]) - mixed
+    distances = np.sqrt(np.clip(divergence, 0.0, 1.0))
+
+    empty = totals[:, 0] == 0
+    distances[empty, :] = 1.0
+    distances[:, empty] = 1.0
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+def _location_readings(phonetic_maps, names, column):
+    """
+    取出各地点某一维度的聲韻對應表，统一成同一个符号表下的 LocationReadings（已经是的直接沿用）。
+    """
+    maps = [phonetic_maps[name][column] for name in names]
+    corpus = next((m.corpus for m in maps if isinstance(m, LocationReadings)), None) or SymbolCorpus()
+    return corpus, [m if isinstance(m, LocationReadings) and m.corpus is corpus else corpus.compact(m) for m in maps]
+
+
+def _canonical_phones(corpus, merge_map):
+    # 每个声韵编号归并后的编号；先取出全部声韵再登记归并结果，登记新符号不影响遍历
+    symbols = list(corpus.phones.symbols)
+    if not merge_map:
+        return np.arange(len(symbols))
+    return np.array([corpus.phones.intern(merge_map.get(symbol, symbol)) for symbol in symbols], dtype=np.int64)
+
+
+def phone_count_matrix(phonetic_maps, names, column="韵母", merge_map=None):
+    """
+    各地点每个声韵的辖字数（多音字每个读音各计一次），与 caculate_Frequency 的频率表同一口径。
+
+    返回: (声韵列表, 地点 × 声韵 的矩阵)
+    """
+    corpus, readings = _location_readings(phonetic_maps, names, column)
+    canonical = _canonical_phones(corpus, merge_map)
+    n_phones = len(corpus.phones)
+    matrix = np.zeros((len(readings), n_phones))
+    for row, location in enumerate(readings):
+        matrix[row] = np.bincount(canonical[location.phone_id_array()], minlength=n_phones)
+    used = np.flatnonzero(matrix.any(axis=0))
+    return corpus.phones.decode(used.tolist()), matrix[:, used]
+
+
+def correspondence_codes(level_dict, phonetic_maps, names, column="韵母", merge_map=None):
+    """
+    按 arrange 的叶层级分类，取每个地点在每个分类中辖字最多的声韵（同数时取先出现的），编成整数。
+    字和声韵都换成符号表编号：分类成员的字一次查出在该地点的读音区间，展开成 (分类, 声韵) 数组后计数取最大。
+
+    level_dict: arrange.load_levels 的 {层级路径: [字, ...]}
+    phonetic_maps: arrange.load_phonetic_maps 的 {地点: {维度: 聲韻對應表}}
+    column: 比较的维度（"声母"、"韵母"、"声调"）
+    merge_map: 可选的模糊映射（如 arrange.MERGE_CLASSES），先归并再比较
+
+    返回: 地点 × 分类 的整数矩阵（声韵编号，只用于比较是否相同），-1 表示该地点在该分类中没有字
+    """
+    corpus, readings = _location_readings(phonetic_maps, names, column)
+    canonical = _canonical_phones(corpus, merge_map)
+    n_phones = len(corpus.phones)
+
+    # 分类成员 (分类, 字编号)，按分类、字在分类中的顺序排列；语料中没有的字略去
+    member_cats, member_chars = [], []
+    for cat, chars in enumerate(level_dict.values()):
+        for char in chars:
+            char_id = corpus.chars.get_id(char)
+            if char_id is not None:
+                member_cats.append(cat)
+                member_chars.append(char_id)
+    member_cats = np.array(member_cats, dtype=np.int64)
+    member_chars = np.array(member_chars, dtype=np.int64)
+
+    codes = np.full((len(readings), len(level_dict)), -1, dtype=np.int64)
+    for row, location in enumerate(readings):
+        sorted_ids, positions = location.char_index()
+        starts = location.start_array()
+        slots = np.minimum(np.searchsorted(sorted_ids, member_chars), max(len(sorted_ids) - 1, 0))
+        found = np.flatnonzero(sorted_ids[slots] == member_chars) if len(sorted_ids) else np.array([], dtype=np.int64)
+        slots = positions[slots[found]]
+        begins, counts = starts[slots], starts[slots + 1] - starts[slots]
+
+        # 每个成员展开成它的各个读音，保持“分类、字、读音”的先后顺序
+        members = np.repeat(found, counts)
+        offsets = np.arange(len(members)) - np.repeat(np.cumsum(counts) - counts, counts)
+        phones = canonical[location.phone_id_array()[np.repeat(begins, counts) + offsets]]
+
+        keys, first, totals = np.unique(member_cats[members] * n_phones + phones, return_index=True, return_counts=True)
+        cats = keys // n_phones
+        best = np.lexsort((first, -totals, cats))
+        best = best[np.r_[True, cats[best][1:] != cats[best][:-1]]] if len(best) else best
+        codes[row, cats[best]] = keys[best] % n_phones
+    return codes
+
+
+def hamming_distances(codes):
+    """
+    两两对应 Hamming 距离：两地都有字的分类中，主声韵不同的比例；没有共同分类时记为 1。
+    """
+    n = codes.shape[0]
+    distances = np.ones((n, n))
+    np.fill_diagonal(distances, 0.0)
+    if not (codes >= 0).any():  # 没有分类或各地都没有字
+        return distances
+
+    present = (codes >= 0).astype(np.float32)
+    shared = present @ present.T
+
+    # 把 (分类, 声韵) 展开成独热矩阵，同一分类同一声韵的地点对计为一致
+    rows, cols = np.nonzero(codes >= 0)
+    keys = cols.astype(np.int64) * (codes.max() + 1) + codes[rows, cols]
+    _, key_idx = np.unique(keys, return_inverse=True)
+    one_hot = np.zeros((n, key_idx.max() + 1), dtype=np.float32)
+    one_hot[rows, key_idx] = 1.0
+    agree = one_hot @ one_hot.T
+
+    shared = shared.astype(float)
+    np.divide(shared - agree, shared, out=distances, where=shared > 0)
+    np.fill_diagonal(distances, 0.0)
+    return distances
+
+
+def distance_frame(distances, locations):
+    return pd.DataFrame(distances, index=locations, columns=locations)
+
+
+def nearest_neighbours(distances, locations, k=5):
+    """
+    每个地点最近的 k 个地点（不含自身），按距离从近到远：{地点: [(地点, 距离), ...]}。
+    """
+    n = len(locations)
+    k = min(k, n - 1)
+    if k <= 0:
+        return {loc: [] for loc in locations}
+
+    masked = distances.astype(float, copy=True)
+    np.fill_diagonal(masked, np.inf)
+    candidates = np.argpartition(masked, k - 1, axis=1)[:, :k]
+    candidate_distances = np.take_along_axis(masked, candidates, axis=1)
+    order = np.argsort(candidate_distances, axis=1, kind="stable")
+    nearest = np.take_along_axis(candidates, order, axis=1)
+
+    return {
+        loc: [(locations[j], float(masked[i, j])) for j in nearest[i]]
+        for i, loc in enumerate(locations)
+    }
+
+
+def location_distances(level_dict, phonetic_maps, names, column="韵母", merge_map=None):
+    """
+    三种距离一次算出：{距离名: 地点 × 地点 矩阵}，地点顺序同 names。
+    """
+    with profiling.stage("距离矩阵", items=len(names)):
+        _, counts = phone_count_matrix(phonetic_maps, names, column, merge_map)
+        codes = correspondence_codes(level_dict, phonetic_maps, names, column, merge_map)
+        return {
+            "余弦距离": cosine_distances(counts),
+            "JS距离": jensen_shannon_distances(counts),
+            "对应距离": hamming_distances(codes),
+        }
+
+
+def write_distances(save_path, distances, locations, k=5):
+    """
+    每种距离一个 地点 × 地点 的工作表，再加一个“最近地點”工作表：每个地点、每种距离一行，依次列出最近的 k 个地点和距离。
+    """
+    with profiling.stage("保存", items=len(locations)):
+        wb = StreamingWorkbook(save_path)
+        for name, matrix in distances.items():
+            sheet = wb.create_sheet(name)
+            sheet.append(["地点"] + list(locations))
+            for loc, row in zip(locations, np.round(matrix, 4).tolist()):
+                sheet.append([loc] + row)
+
+        sheet = wb.create_sheet("最近地點")
+        header = ["地点", "距离"]
+        for i in range(1, min(k, len(locations) - 1) + 1):
+            header += [f"第{i}近", "距离值"]
+        sheet.append(header)
+        neighbours = {name: nearest_neighbours(matrix, locations, k) for name, matrix in distances.items()}
+        for loc in locations:
+            for name, nearest in neighbours.items():
+                row = [loc, name]
+                for other, value in nearest[loc]:
+                    row += [other, round(value, 4)]
+                sheet.append(row)
+        wb.save()
+    print(f"✅ 已導出 {save_path}")
+
+
+def process(tsv_paths, excel_path, category_column, workers=None, streaming=False, dimension=None,
+            output_dir=arrange.OUTPUT_DIR, k=5):
+    """
+    从TSV文件算出各地点两两之间的三种距离，每个分类列写一个工作簿（见 write_distances）。
+    参数与 arrange.process 相同：tsv_paths 可以含 "_" 佔位（略去），category_column 可以是列表，
+    dimension 为单个维度，None 时用 arrange.selected_dimension 选定的维度。
+
+    返回: 已保存的文件路径列表
+    """
+    column = arrange.selected_dimension(dimension)
+    categories = [category_column] if isinstance(category_column, str) else list(category_column)
+    jobs = [(os.path.splitext(os.path.basename(path))[0], path) for path in tsv_paths if path != "_"]
+    names = [name for name, _ in jobs]
+    phonetic_maps = arrange.load_phonetic_maps(
+        names, [path for _, path in jobs], workers, streaming, (column,), SymbolCorpus()
+    )
+
+    os.makedirs(output_dir, exist_ok=True)
+    saved = []
+    for category in categories:
+        with profiling.stage("读取层级"):
+            level_dict = arrange.load_levels(excel_path, category)[0]
+        distances = location_distances(level_dict, phonetic_maps, names, column, arrange.MERGE_CLASSES)
+        save_path = os.path.join(output_dir, f"距离_{category}_{column}.xlsx")
+        write_distances(save_path, distances, names, k)
+        saved.append(save_path)
+    return saved
@@ -1,324 +1,638 @@
+import functools
 import math
 
+import numpy as np
 import pandas as pd
 import re
 
+import tsv_cache
+
 # 定义元音的正则表达式（支持多个元音）
 vowel_pattern = r"[iyɨʉɯuɪʏɿʅʅɭıɪſɩɷʮɥʯʊeɘɵəɤoɛεɝɚᴇœɜɞʌɔæaɶɑɒᴀɐãẽĩỹõúαᵘᶷᶤᶶᵚʸᶦᵊⁱ◌∅ø]"
 
 
-def get_vowels_from_tsv(tsv_file_path: str, char_list: list) -> pd.DataFrame:
+# 韵母的规范化替换表（一次扫描，见 Normalizer）
+vowel_replacements = {
+    'ε': 'ɛ', "α": "ɑ", "ʯ": "ʮ", "∅": "ø",
+    "ã": "ã", "ẽ": "ẽ", "ĩ": "ĩ", "ỹ": "ỹ", "õ": "õ", "ʱ": "ʰ"
+}
+
+# 声母的规范化替换表（一次扫描、最长匹配优先，值须是最终形式，不会再被其他键替换）
+consonant_replacements = {
+    '∫': 'ʃ', 'th': 'tʰ', 'kh': 'kʰ', 'ph': 'pʰ',
+    'tsh': 'ʦʰ', 'ths': 'ʦʰ', 'tʰs': 'ʦʰ', "ς": "ɕ", 'ts': 'ʦ',
+    'tʃ': 'ʧ', 't∫': 'ʧ', 'tɕ': 'ʨ', 'tς': 'ʨ',
+    "∨": "v", "ł": "ɬ"
+}
+
+# 音典声调映射
+tone_map_yindian = {
+    "1": "陰平", "1a": "陰平甲", "1b": "陰平乙", "1A": "陰平甲", "1B": "陰平乙",
+    "2": "陽平", "2a": "陽平甲", "2b": "陽平乙", "2A": "陽平甲", "2B": "陽平乙",
+    "3": "陰上", "3a": "陰上甲", "3b": "陰上乙", "3A": "陰上甲", "3B": "陰上乙",
+    "4": "陽上", "4a": "陽上甲", "4b": "陽上乙", "4A": "陽上甲", "4B": "陽上乙",
+    "5": "陰去", "5a": "陰去甲", "5b": "陰去乙", "5A": "陰去甲", "5B": "陰去乙",
+    "6": "陽去", "6a": "陽去甲", "6b": "陽去乙", "6A": "陽去甲", "6B": "陽去乙",
+    "7": "陰入", "7a": "上陰入", "7b": "下陰入", "7c": "陰入丙", "7A": "上陰入", "7B": "下陰入",
+    "8": "陽入", "8a": "上陽入", "8b": "下陽入", "8A": "上陽入", "8B": "下陽入",
+    "9": "變調", "9a": "變調1", "9b": "變調2", "0": "變調", "10": "輕聲", "輕聲": "輕聲"
+}
+
+# 粵拼声调映射
+tone_map_jyutping = {
+    "1": "陰平", "2": "陰上", "3": "陰去", "4": "陽平", "5": "陽上", "6": "陽去",
+    "7": "上陰入", "8": "下陰入", "9": "陽入", "10": "下陽入", "0": "變調"
+}
+
+# parse_tsv 输出表的列
+TABLE_COLUMNS = ['汉字', '音标', '声母', '韵母', '声调']
+
+# 修改提取逻辑（而不只是上面的规则表）时递增，使旧的解析缓存失效
+EXTRACTOR_VERSION = 1
+EXTRACTOR_FINGERPRINT = tsv_cache.fingerprint(
+    EXTRACTOR_VERSION, vowel_pattern, vowel_replacements, consonant_replacements,
+    tone_map_yindian, tone_map_jyutping, TABLE_COLUMNS,
+)
+
+
+def extract_vowel(phonetic):
     """
-    从TSV文件中提取与字列表匹配的所有汉字以及对应的韵母。
+    从一个音标中提取韵母（未拆分、未规范化）。
 
-    tsv_file_path: TSV文件路径
-    char_list: 要查找的汉字列表
+    返回: 韵母字符串；该音标不参与韵母统计时返回 None
+    """
+    if not phonetic or (isinstance(phonetic, float) and math.isnan(phonetic)):
+        return None  # 跳過空值或 NaN
+    # 如果是字符串且开头是数字，跳过（新增）
+    if isinstance(phonetic, str) and phonetic and phonetic[0].isdigit():
+        return None
 
-    返回: 包含匹配的汉字、音标和韵母的DataFrame
+    all_rhymes = []
+    # 提取音标中的韵母
+    if phonetic.startswith("∅"):
+        phonetic = phonetic[1:]
+    # 只有當 phonetic 不含 j/ʲ，或它們出現在第 0 位，才進行韻母提取
+    if ('j' not in phonetic[1:] and 'ʲ' not in phonetic[1:]):
+        vowel_found = False
+        for phonetic_char in phonetic:
+            if re.match(vowel_pattern, phonetic_char) and not vowel_found:
+                vowel_found = True
+                all_rhymes.append(phonetic_char)  # 添加第一个元音
+            elif vowel_found and (phonetic_char.isdigit() or phonetic_char.isspace()):
+                break  # 遇到数字或空格时停止
+            elif vowel_found and re.match(vowel_pattern, phonetic_char):
+                all_rhymes.append(phonetic_char)  # 继续添加后续的元音
+            elif vowel_found and not re.match(vowel_pattern, phonetic_char):
+                all_rhymes.append(phonetic_char)  # 遇到辅音继续添加
+        # 鼻化韻：
+        if not vowel_found and any(c in phonetic for c in "mnŋȵƞʋvʒ"):
+            all_rhymes += list(
+                re.match(r".*?([mnŋȵƞʋvʒ].*?)(?=\d|\s|$)", phonetic).group(1)
+            ) if re.search(r"[mnŋȵƞʋvʒ]", phonetic) else []
+
+        rhyme = ''.join(all_rhymes)
+    else:
+        # j 或 ʲ 出現在中間
+        match = re.search(rf"[{vowel_pattern.strip('()')}jʲ][^\d\s]*", phonetic)
+        rhyme = match.group(0) if match else ''
+    # 筛除“声韵”中的汉字和数字
+    return ''.join(c for c in rhyme if not (c.isdigit() or re.match(r'[\u4e00-\u9fff]', c)))
+
+
+def extract_consonant(phonetic):
     """
-    # 读取TSV文件
-    tsv_df = pd.read_csv(tsv_file_path, sep="\t")
+    从一个音标中提取声母（未拆分、未规范化）。
 
-    if '#漢字' not in tsv_df.columns:
-        print("错误：找不到 '#漢字' 列，请检查文件结构！")
-        return pd.DataFrame()  # 返回空的 DataFrame，避免后续错误
+    返回: 声母字符串；该音标不参与声母统计时返回 None
+    """
+    # 如果音标为空，跳过
+    if phonetic is None or (isinstance(phonetic, float) and math.isnan(phonetic)):
+        return None
+    if isinstance(phonetic, str) and phonetic.isdigit():
+        return None
+    # 如果是字符串且开头是数字，跳过（新增）
+    if isinstance(phonetic, str) and phonetic and phonetic[0].isdigit():
+        return None
 
-    # 如果 char_list 为 'all'，获取所有汉字并去重，忽略 "□" 和 "□ □"
-    if char_list == "all":
-        char_list = tsv_df['#漢字'].drop_duplicates().tolist()
-        char_list = [char for char in char_list if char not in ["□", "□"]]  # 排除 "□" 和 "□ □"
+    if not re.search(vowel_pattern, re.split(r"\d", phonetic)[0]):
+        vowel_new = r"([mnŋȵƞʋvʒlf])"  # 有的点把ɿ识别为了fl 酌情加入该列表
+        if phonetic[0] in ['l', 'f']:
+            consonant = phonetic[0]
+        elif re.match(vowel_new, phonetic[0]):
+            consonant = "∅"
+        elif not re.search(vowel_new, phonetic):
+            consonant = f"报错：{phonetic}"
+        else:
+            consonant = ""
+            for char in phonetic:
+                if re.match(vowel_new, char) or re.match(r'\d', char):
+                    break  # 一旦遇到元音，停止
+                consonant += char  # 否则，添加字符到声母部分
     else:
-        char_list = list(dict.fromkeys(char_list))  # 保持顺序去重
-
-    # 存储匹配结果
-    matched_results = []
-
-    # 遍历字列表
-    for char in char_list:
-        # 查找对应汉字的音标
-        matched_rows = tsv_df[tsv_df['#漢字'] == char]
-
-        if not matched_rows.empty:
-            # 对于每个匹配的汉字，遍历所有音标
-            for index, row in matched_rows.iterrows():
-                phonetic = row['音標']
-                all_rhymes = []
-
-                if not phonetic or (isinstance(phonetic, float) and math.isnan(phonetic)):
-                    continue  # 跳過空值或 NaN
-                # 如果是字符串且开头是数字，跳过（新增）
-                if isinstance(phonetic, str) and phonetic and phonetic[0].isdigit():
-                    continue
-
-                # 提取音标中的韵母
-                if phonetic.startswith("∅"):
-                    phonetic = phonetic[1:]
-                # 只有當 phonetic 不含 j/ʲ，或它們出現在第 0 位，才進行韻母提取
-                if ('j' not in phonetic[1:] and 'ʲ' not in phonetic[1:]):
-                    vowel_found = False
-                    for phonetic_char in phonetic:
-                        if re.match(vowel_pattern, phonetic_char) and not vowel_found:
-                            vowel_found = True
-                            all_rhymes.append(phonetic_char)  # 添加第一个元音
-                        elif vowel_found and (phonetic_char.isdigit() or phonetic_char.isspace()):
-                            break  # 遇到数字或空格时停止
-                        elif vowel_found and re.match(vowel_pattern, phonetic_char):
-                            all_rhymes.append(phonetic_char)  # 继续添加后续的元音
-                        elif vowel_found and not re.match(vowel_pattern, phonetic_char):
-                            all_rhymes.append(phonetic_char)  # 遇到辅音继续添加
-                    # 鼻化韻：
-                    if not vowel_found and any(c in phonetic for c in "mnŋȵƞʋvʒ"):
-                        all_rhymes += list(
-                            re.match(r".*?([mnŋȵƞʋvʒ].*?)(?=\d|\s|$)", phonetic).group(1)
-                        ) if re.search(r"[mnŋȵƞʋvʒ]", phonetic) else []
-
-                    rhyme = ''.join(all_rhymes)
-                    # 筛除“声韵”中的汉字和数字
-                    rhyme = ''.join(c for c in rhyme if not (c.isdigit() or re.match(r'[\u4e00-\u9fff]', c)))
-                    matched_results.append({'汉字': char, '音标': phonetic, '声韵': rhyme})
-                else:
-                    # j 或 ʲ 出現在中間
-                    match = re.search(rf"[{vowel_pattern.strip('()')}jʲ][^\d\s]*", phonetic)
-                    rhyme = match.group(0) if match else ''
-                    # 筛除“声韵”中的汉字和数字
-                    rhyme = ''.join(c for c in rhyme if not (c.isdigit() or re.match(r'[\u4e00-\u9fff]', c)))
-                    matched_results.append({'汉字': char, '音标': phonetic, '声韵': rhyme})
-
-    # 转换为DataFrame
-    result_df = pd.DataFrame(matched_results)
-
-    # 拆分包含 "/" 的声韵为两个记录
-    expanded_results = []
-    for row in matched_results:
-        consonant = row['声韵']
-        if '/' in consonant and consonant.strip() != '/':
-            parts = consonant.split('/')
-            for part in parts:
-                expanded_results.append({
-                    '汉字': row['汉字'],
-                    '音标': row['音标'],
-                    '声韵': part.strip()
-                })
+        # 1. 判断开头是否是元音（如果是，视为零声母）
+        if re.match(vowel_pattern, phonetic[0]):
+            consonant = "∅"
+        # # 2. 如果音标中没有元音，而且开头是 m/n/ŋ，则视为零声母
+        # elif not re.search(vowel_pattern, phonetic) and phonetic[0] in ['m', 'n', 'ŋ']:
+        #     consonant = "∅"
+        # elif not re.search(vowel_pattern, phonetic):
+        #     # 3. 如果没有元音，提取开头的第一个字符作为声母
+        #     consonant = phonetic[0]
+        elif ('j' in phonetic[1:] or 'ʲ' in phonetic[1:]):
+            consonant = ""
+            for char in phonetic:
+                if re.match(vowel_pattern, char) or char in ('j', 'ʲ'):
+                    break
+                consonant += char
         else:
-            expanded_results.append(row)
-    # 用新的列表覆盖旧的结果
-    result_df = pd.DataFrame(expanded_results)
-
-    # 替换 ε 为 ɛ（如果有）
-    # result_df['声韵'] = result_df['声韵'].str.replace('ε', 'ɛ', regex=False)
-    replacements = {
-        'ε': 'ɛ', "α": "ɑ", "ʯ": "ʮ", "∅": "ø",
-        "ã": "ã", "ẽ": "ẽ", "ĩ": "ĩ", "ỹ": "ỹ", "õ": "õ", "ʱ": "ʰ"
-    }
-    for old, new in replacements.items():
-        result_df['声韵'] = result_df['声韵'].str.replace(old, new, regex=True)
+            # 4. 否则，提取第一个字符到第一个元音之间的部分作为声母
+            consonant = ""
+            for char in phonetic:
+                if re.match(vowel_pattern, char):
+                    break  # 一旦遇到元音，停止
+                consonant += char  # 否则，添加字符到声母部分
+                consonant = re.sub(r"\d", "", consonant)
+    return consonant
 
-    return result_df
+
+def extract_tone_code(phonetic: str):
+    """
+    提取音标结尾的调号（数字 + 可选的一个字母），移除前导0以兼容 "03" -> "3"。
+    """
+    match = re.search(r"(\d+[a-z]?)$", phonetic)
+    if match:
+        return match.group(1).lstrip("0")
+    return None
 
 
-import pandas as pd
-import re
+def choose_tone_map(phonetic_shi, phonetic_qiong) -> dict:
+    """
+    判斷使用哪個聲調系統（根據“時”與“窮”的第一個讀音）。
+    """
+    def extract_tone_number(phonetic):
+        if phonetic is not None:
+            match = re.search(r"(\d+)", str(phonetic))
+            if match:
+                return match.group(1).lstrip("0")
+        return None
 
+    tone_shi = extract_tone_number(phonetic_shi)
+    tone_qiong = extract_tone_number(phonetic_qiong)
 
-def get_consonants_from_tsv(tsv_file_path: str, char_list: list) -> pd.DataFrame:
+    # 判斷邏輯
+    if "2" in [tone_shi, tone_qiong]:
+        return tone_map_yindian
+    elif all(tone in ["4", None] for tone in [tone_shi, tone_qiong]):
+        return tone_map_jyutping
+    else:
+        return tone_map_yindian
+
+
+def expand_readings(value: str) -> list:
     """
-    从TSV文件中提取与字列表匹配的所有汉字及其对应的声母。
+    拆分包含 "/" 的声韵为多个记录。
+    """
+    if '/' in value and value.strip() != '/':
+        return [part.strip() for part in value.split('/')]
+    return [value]
 
-    tsv_file_path: TSV文件路径
-    char_list: 要查找的汉字列表
 
-    返回: 包含匹配的汉字和声母的DataFrame
+class Normalizer:
     """
+    把替换表编译成一次扫描的规范化器：
+    全是单字符键时用 str.translate，否则把所有键按长度从长到短合并成一个正则，最长匹配优先。
+    结果按取值缓存，每个不同的声韵只规范化一次。
+    """
+
+    def __init__(self, replacements: dict):
+        self.replacements = dict(replacements)
+        if all(len(old) == 1 for old in self.replacements):
+            self._table = str.maketrans(self.replacements)
+            self._pattern = None
+        else:
+            self._table = None
+            keys = sorted(self.replacements, key=len, reverse=True)
+            self._pattern = re.compile("|".join(re.escape(key) for key in keys))
+        self._cache = {}
+
+    def __call__(self, value: str) -> str:
+        normalized = self._cache.get(value)
+        if normalized is None:
+            if self._pattern is None:
+                normalized = value.translate(self._table)
+            else:
+                normalized = self._pattern.sub(lambda m: self.replacements[m.group(0)], value)
+            self._cache[value] = normalized
+        return normalized
+
+
+normalize_vowel = Normalizer(vowel_replacements)
+normalize_consonant = Normalizer(consonant_replacements)
+
+
+def build_char_index(tsv_df: pd.DataFrame) -> dict:
+    """
+    为TSV建立 汉字 -> 行位置 的索引，只扫描一次 '#漢字' 列。
+
+    返回: 按汉字首次出现顺序排列的字典，值为该字所在行的位置（升序），空值不入索引
+    """
+    codes, uniques = pd.factorize(tsv_df['#漢字'])
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {char: order[bounds[i]:bounds[i + 1]] for i, char in enumerate(uniques)}
+
+
+def parse_tsv_frame(tsv_df: pd.DataFrame, engine: str = "loop") -> pd.DataFrame:
+    """
+    解析已读入的TSV表中的全部汉字，同时提取每个读音的声母、韵母和声调。
+
+    engine: "loop" 逐字符循环提取；"vectorized" 把不同的音标排成码位矩阵整列提取，结果与 "loop" 完全相同
+
+    返回: 包含 汉字、音标、声母、韵母、声调 列的DataFrame，每行对应TSV中的一个读音，
+          按汉字首次出现的顺序分组排列。
+          声母、韵母、声调列为已按 "/" 拆分并规范化的元组，不参与该维度统计的读音为空元组。
+    """
+    char_values = tsv_df['#漢字'].to_numpy()
+    phonetic_values = tsv_df['音標'].to_numpy()
+
+    def first_phonetic(char):
+        positions = np.flatnonzero(char_values == char)
+        return phonetic_values[positions[0]] if len(positions) else None
+
+    tone_map = choose_tone_map(first_phonetic("時"), first_phonetic("窮"))
 
-    # 读取TSV文件
-    tsv_df = pd.read_csv(tsv_file_path, sep="\t")
+    # 按汉字首次出现的顺序分组：编号按首次出现分配，稳定排序后同一个字的行保持原顺序，空值（-1）排在最前
+    codes, _ = pd.factorize(char_values)
+    positions = np.argsort(codes, kind='stable')
+    positions = positions[codes[positions] >= 0]
+    if engine == "vectorized":
+        return _parse_frame_vectorized(char_values[positions], phonetic_values[positions], tone_map)
+    records = parse_rows(char_values[positions], phonetic_values[positions], tone_map, engine)
+    return pd.DataFrame(records, columns=TABLE_COLUMNS)
 
-    if '#漢字' not in tsv_df.columns:
-        print("错误：找不到 '#漢字' 列，请检查文件结构！")
-        return pd.DataFrame()  # 返回空的 DataFrame，避免后续错误
 
-    # 如果 char_list 为 'all'，获取所有汉字并去重，忽略 "□" 和 "□ □"
+def parse_rows(chars: list, phonetics, tone_map: dict, engine: str = "loop") -> list:
+    """
+    逐行提取声母、韵母和声调。
+
+    chars: 每行的汉字
+    phonetics: 每行的音标
+    tone_map: 该文件使用的声调映射，见 choose_tone_map
+
+    返回: (汉字, 音标, 声母, 韵母, 声调) 元组的列表，顺序与输入一致，三个维度都没有结果的行被略去
+    """
+    if engine == "vectorized":
+        return list(_parse_frame_vectorized(chars, phonetics, tone_map).itertuples(index=False, name=None))
+    elif engine != "loop":
+        raise ValueError(f"未知的提取引擎：{engine}")
+
+    records = []
+    for char, phonetic in zip(chars, phonetics):
+        consonant = extract_consonant(phonetic)
+        vowel = extract_vowel(phonetic)
+        tone_code = extract_tone_code(str(phonetic))
+
+        consonants = tuple(normalize_consonant(part)
+                           for part in expand_readings(consonant)) if consonant is not None else ()
+        vowels = tuple(normalize_vowel(part)
+                       for part in expand_readings(vowel)) if vowel is not None else ()
+        tones = (tone_map.get(tone_code, tone_map_yindian.get(tone_code, "未知")),) \
+            if tone_code is not None else ()
+
+        if consonants or vowels or tones:
+            records.append((char, str(phonetic), consonants, vowels, tones))
+    return records
+
+
+# 向量化引擎用到的字符类，与逐字符循环的判断方式完全相同：str.isdigit 比正则的 \\d 多出上标、圈码等，两者分开判断
+_NASALS = "mnŋȵƞʋvʒ"            # 鼻化韻的起點
+_SYLLABIC = _NASALS + "lf"      # 沒有元音時聲母的邊界
+_CHAR_TESTS = {
+    'vowel': lambda c: re.match(vowel_pattern, c) is not None,
+    'digit': str.isdigit,
+    'decimal': lambda c: re.match(r'\d', c) is not None,
+    'space': str.isspace,
+    'nasal': lambda c: c in _NASALS,
+    'syllabic': lambda c: c in _SYLLABIC,
+    'medial': lambda c: c in 'jʲ',
+    'han': lambda c: re.match(r'[\u4e00-\u9fff]', c) is not None,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _char_flags(point: int) -> int:
+    # 一个字符所属的各类编成一个位掩码；码位 0 是矩阵的填充
+    char = chr(point)
+    return sum(1 << bit for bit, test in enumerate(_CHAR_TESTS.values()) if point and test(char))
+
+
+def _char_classes(codes: np.ndarray) -> dict:
+    """
+    对码位矩阵中出现过的每个不同字符只判断一次类别（跨文件缓存），返回与矩阵同形的各类布尔矩阵。
+    """
+    points = np.flatnonzero(np.bincount(codes.ravel()))
+    table = np.zeros(points[-1] + 1, dtype=np.uint16)
+    table[points] = [_char_flags(point) for point in points.tolist()]
+    matrix = table[codes]
+    return {name: (matrix & (1 << bit)) != 0 for bit, name in enumerate(_CHAR_TESTS)}
+
+
+def _first(mask: np.ndarray, start: np.ndarray = None) -> np.ndarray:
+    # 每行从 start（含）起第一个为真的位置，没有时为矩阵宽度
+    if start is not None:
+        mask = mask & (np.arange(mask.shape[1]) >= start[:, None])
+    first = mask.argmax(axis=1)
+    return np.where(mask[np.arange(len(mask)), first], first, mask.shape[1])
+
+
+def _slice(texts: list, start: np.ndarray, stop: np.ndarray) -> np.ndarray:
+    # 起止位置已整列求出，这里只按位置切出字符串，返回 object 数组
+    sliced = np.empty(len(texts), dtype=object)
+    sliced[:] = [text[i:j] for text, i, j in zip(texts, start.tolist(), stop.tolist())]
+    return sliced
+
+
+def _extract_vectorized(texts: list, is_text: np.ndarray):
+    """
+    对一组音标同时提取声母、韵母和调号，结果与逐个调用 extract_consonant、extract_vowel、extract_tone_code 相同。
+    音标排成 (音标数 × 最大长度) 的码位矩阵，各分支的起止位置都用整列的数组运算求出。
+
+    texts: 音标（非字符串已转成 str）
+    is_text: 原值是否为字符串，不是字符串的（NaN 等）不参与声母、韵母统计
+
+    返回: 声母、韵母、调号三个 object 数组，不参与该维度统计的音标为 None
+    """
+    n = len(texts)
+    if n == 0:
+        return (np.empty(0, dtype=object),) * 3
+    matrix = np.array(texts, dtype=str)
+    width = matrix.dtype.itemsize // 4
+    codes = matrix.view(np.uint32).reshape(n, width)
+    length = np.fromiter(map(len, texts), dtype=np.intp, count=n)
+    cls = _char_classes(codes)
+    vowel, digit, decimal, space, medial = cls['vowel'], cls['digit'], cls['decimal'], cls['space'], cls['medial']
+
+    # 空串和以数字开头的音标不参与声母、韵母统计
+    valid = is_text & (length > 0) & ~digit[:, 0]
+
+    # 韵母：去掉开头的 ∅ 后从 skip 起算；一般的音标从第一个元音取到数字或空格为止
+    skip = (codes[:, 0] == ord('∅')).astype(np.intp)
+    rhyme_start = _first(vowel, skip)
+    rhyme_end = _first(digit | space, rhyme_start + 1)
+    # j/ʲ 在中間時的正則 "[[元音]jʲ][^\d\s]*" 實為“元音或 [ 後接 jʲ]”，照原樣匹配
+    rows = np.flatnonzero(_first(medial, skip + 1) < width)
+    if len(rows):
+        sub = codes[rows]
+        bracket = np.zeros(sub.shape, dtype=bool)
+        if width >= 4:
+            bracket[:, :-3] = ((vowel[rows] | (sub == ord('[')))[:, :-3] & (sub[:, 1:-2] == ord('j'))
+                               & (sub[:, 2:-1] == ord('ʲ')) & (sub[:, 3:] == ord(']')))
+        rhyme_start[rows] = _first(bracket, skip[rows])
+        rhyme_end[rows] = _first(decimal[rows] | space[rows], rhyme_start[rows] + 4)
+    # 鼻化韻：没有元音时从第一个鼻音取到数字或空格为止
+    rows = np.setdiff1d(np.flatnonzero(rhyme_start == width), rows, assume_unique=True)
+    if len(rows):
+        rhyme_start[rows] = _first(cls['nasal'][rows], skip[rows])
+        rhyme_end[rows] = _first(decimal[rows] | space[rows], rhyme_start[rows] + 1)
+    vowels = _slice(texts, rhyme_start, np.minimum(rhyme_end, length))
+    # 韵母中间夹有汉字或上标数字的很少，只对这些行筛除汉字和数字
+    pos = np.arange(width)
+    rows = np.flatnonzero(((digit | cls['han']) & (pos >= rhyme_start[:, None]) & (pos < rhyme_end[:, None])).any(axis=1))
+    vowels[rows] = [''.join(c for c in vowels[row] if not (c.isdigit() or re.match(r'[\u4e00-\u9fff]', c)))
+                    for row in rows.tolist()]
+    vowels[~valid] = None
+
+    # 声母：第一个数字之前有没有元音决定走哪一支；有元音时第一个元音必在数字之前，去数字一步不会去掉任何字符
+    consonant_end = _first(vowel)
+    head_vowel = consonant_end < _first(decimal)
+    rows = np.flatnonzero(head_vowel & (_first(medial, np.ones(n, dtype=np.intp)) < width))
+    consonant_end[rows] = _first(vowel[rows] | medial[rows])
+    first = codes[:, 0]
+    lf = (first == ord('l')) | (first == ord('f'))
+    syllabic = cls['syllabic']
+    rows = np.flatnonzero(~head_vowel)
+    consonant_end[rows] = np.where(lf[rows], 1, _first(syllabic[rows] | decimal[rows]))
+    consonants = _slice(texts, np.zeros(n, dtype=np.intp), consonant_end)
+    consonants[np.where(head_vowel, vowel[:, 0], ~lf & syllabic[:, 0])] = "∅"
+    error = ~head_vowel & (_first(syllabic) == width) & valid
+    consonants[error] = [f"报错：{texts[row]}" for row in np.flatnonzero(error).tolist()]
+    consonants[~valid] = None
+
+    # 调号：结尾的一串数字加可选的一个小写字母，去掉前导 0
+    rows = np.arange(n)
+    final = codes[rows, np.maximum(length - 1, 0)]
+    digit_end = length - 1 - ((final >= ord('a')) & (final <= ord('z')))
+    has_tone = (digit_end >= 0) & decimal[rows, np.maximum(digit_end, 0)]
+    run = ~decimal & (pos <= digit_end[:, None])
+    tone_start = np.where(run.any(axis=1), width - run[:, ::-1].argmax(axis=1), 0)
+    tone_start = np.minimum(_first(codes != ord('0'), tone_start), length)
+    tone_codes = _slice(texts, tone_start, length)
+    tone_codes[~has_tone] = None
+    return consonants, vowels, tone_codes
+
+
+def _expand_all(values: np.ndarray, expand) -> np.ndarray:
+    """
+    提取出的声母、韵母、调号种类很少，每个不同的取值只拆分、规范化一次，再按编号展开成元组数组；None 为空元组。
+    """
+    codes, uniques = pd.factorize(values)
+    expanded = np.empty(len(uniques) + 1, dtype=object)
+    for i, value in enumerate(uniques):
+        expanded[i] = expand(value)
+    expanded[-1] = ()
+    return expanded[codes]
+
+
+def _parse_frame_vectorized(chars, phonetics, tone_map: dict) -> pd.DataFrame:
+    # 同一个音节在字表中反复出现，只对不同的音标各提取一次，再按编号取出每一行，整列构造结果表
+    codes, uniques = pd.factorize(np.asarray(phonetics, dtype=object))
+    is_text = np.fromiter(map(isinstance, uniques, [str] * len(uniques)), dtype=bool, count=len(uniques))
+    texts = list(uniques) if is_text.all() else [p if isinstance(p, str) else str(p) for p in uniques]
+    consonants, vowels, tone_codes = _extract_vectorized(texts, is_text)
+
+    # 拆分后至少有一个读音，所以提取结果不为 None 的维度就有结果；三个维度都没有结果的行略去（NaN 的编号为 -1）
+    found = np.append(pd.notna(consonants) | pd.notna(vowels) | pd.notna(tone_codes), False)[codes]
+    rows = codes[found]
+    consonants = _expand_all(consonants, lambda value: tuple(normalize_consonant(part)
+                                                             for part in expand_readings(value)))
+    vowels = _expand_all(vowels, lambda value: tuple(normalize_vowel(part) for part in expand_readings(value)))
+    tones = _expand_all(tone_codes, lambda code: (tone_map.get(code, tone_map_yindian.get(code, "未知")),))
+    return pd.DataFrame({
+        '汉字': np.asarray(chars, dtype=object)[found],
+        '音标': np.array(texts, dtype=object)[rows],
+        '声母': consonants[rows],
+        '韵母': vowels[rows],
+        '声调': tones[rows],
+    }, columns=TABLE_COLUMNS)
+
+
+def select_chars(table: pd.DataFrame, char_list) -> pd.DataFrame:
+    """
+    从 parse_tsv_frame 的整表中按字列表的顺序取出对应的读音。
+    """
     if char_list == "all":
-        char_list = tsv_df['#漢字'].drop_duplicates().tolist()
-        char_list = [char for char in char_list if char not in ["□", "□"]]  # 排除 "□" 和 "□ □"
-    else:
-        char_list = list(dict.fromkeys(char_list))  # 保持顺序去重
-
-    # 存储匹配结果
-    matched_results = []
-
-    # 遍历字列表
-    for char in char_list:
-        # 查找对应汉字的音标
-        matched_rows = tsv_df[tsv_df['#漢字'] == char]
-
-        if not matched_rows.empty:
-            # 对于每个匹配的汉字，遍历所有音标
-            for index, row in matched_rows.iterrows():
-                phonetic = row['音標']
-
-                # 如果音标为空，跳过
-                if phonetic is None or (isinstance(phonetic, float) and math.isnan(phonetic)):
-                    continue
-                # print(phonetic)
-                if isinstance(phonetic, str) and phonetic.isdigit():
-                    continue
-                # 如果是字符串且开头是数字，跳过（新增）
-                if isinstance(phonetic, str) and phonetic and phonetic[0].isdigit():
-                    continue
-
-                if not re.search(vowel_pattern, re.split(r"\d", phonetic)[0]):
-                    vowel_new = r"([mnŋȵƞʋvʒlf])"  # 有的点把ɿ识别为了fl 酌情加入该列表
-                    if phonetic[0] in ['l', 'f']:
-                        consonant = phonetic[0]
-                    elif re.match(vowel_new, phonetic[0]):
-                        consonant = "∅"
-                    elif not re.search(vowel_new, phonetic):
-                        consonant = f"报错：{phonetic}"
-                    else:
-                        consonant = ""
-                        for char in phonetic:
-                            if re.match(vowel_new, char) or re.match(r'\d', char):
-                                break  # 一旦遇到元音，停止
-                            consonant += char  # 否则，添加字符到声母部分
-                else:
-                    # 1. 判断开头是否是元音（如果是，视为零声母）
-                    if re.match(vowel_pattern, phonetic[0]):
-                        consonant = "∅"
-                    # # 2. 如果音标中没有元音，而且开头是 m/n/ŋ，则视为零声母
-                    # elif not re.search(vowel_pattern, phonetic) and phonetic[0] in ['m', 'n', 'ŋ']:
-                    #     consonant = "∅"
-                    # elif not re.search(vowel_pattern, phonetic):
-                    #     # 3. 如果没有元音，提取开头的第一个字符作为声母
-                    #     consonant = phonetic[0]
-                    elif ('j' in phonetic[1:] or 'ʲ' in phonetic[1:]):
-                        consonant = ""
-                        for char in phonetic:
-                            if re.match(vowel_pattern, char) or char in ('j', 'ʲ'):
-                                break
-                            consonant += char
-                    else:
-                        # 4. 否则，提取第一个字符到第一个元音之间的部分作为声母
-                        consonant = ""
-                        for char in phonetic:
-                            if re.match(vowel_pattern, char):
-                                break  # 一旦遇到元音，停止
-                            consonant += char  # 否则，添加字符到声母部分
-                            consonant = re.sub(r"\d", "", consonant)
-
-                # 存储结果
-                matched_results.append({'汉字': row['#漢字'], '音标': phonetic, '声韵': consonant})
-
-    # 拆分包含 "/" 的声韵为两个记录
-    expanded_results = []
-    for row in matched_results:
-        consonant = row['声韵']
-        if '/' in consonant and consonant.strip() != '/':
-            parts = consonant.split('/')
-            for part in parts:
-                expanded_results.append({
-                    '汉字': row['汉字'],
-                    '音标': row['音标'],
-                    '声韵': part.strip()
-                })
-        else:
-            expanded_results.append(row)
-    # 用新的列表覆盖旧的结果
-    result_df = pd.DataFrame(expanded_results)
-
-    # 替换 ε 为 ɛ（如果有）
-    replacements = {
-        '∫': 'ʃ', 'th': 'tʰ', 'kh': 'kʰ', 'ph': 'pʰ',
-        'tsh': 'tsʰ', "ς": "ɕ", 'ts': 'ʦ', 'tʃ': 'ʧ', 'tɕ': 'ʨ',
-        "∨": "v", "ł": "ɬ", "tʰs": "ʦʰ"
-    }
-    for old, new in replacements.items():
-        result_df['声韵'] = result_df['声韵'].str.replace(old, new, regex=True)
+        return table
+    order = {char: i for i, char in enumerate(dict.fromkeys(char_list))}  # 保持顺序去重
+    subset = table[table['汉字'].isin(order)]
+    positions = np.argsort(subset['汉字'].map(order).to_numpy(), kind='stable')
+    return subset.iloc[positions].reset_index(drop=True)
+
+
+def parse_tsv(tsv_file_path: str, char_list="all", use_cache: bool = True, engine: str = "loop") -> pd.DataFrame:
+    """
+    一次读取TSV文件，同时提取每个读音的声母、韵母和声调。
+
+    tsv_file_path: TSV文件路径
+    char_list: 要查找的汉字列表，"all" 表示全部汉字（按首次出现的顺序）
+    use_cache: 是否使用磁盘缓存（见 tsv_cache），文件和提取规则都未改动时直接读回上次的解析结果
+    engine: 提取引擎，见 parse_tsv_frame
+
+    返回: 见 parse_tsv_frame
+    """
+    table = None
+    if use_cache:
+        # 两种引擎的结果相同，但仍分开缓存，计时和对照时不会读到另一种引擎的结果
+        key = tsv_cache.cache_key(tsv_file_path, tsv_cache.fingerprint(EXTRACTOR_FINGERPRINT, engine))
+        table = tsv_cache.load(key)
+
+    if table is None:
+        # 读取TSV文件
+        tsv_df = pd.read_csv(tsv_file_path, sep="\t")
+
+        if '#漢字' not in tsv_df.columns or '音標' not in tsv_df.columns:
+            print("错误：文件缺少必要的 '#漢字' 或 '音標' 列！")
+            return pd.DataFrame(columns=TABLE_COLUMNS)
+
+        table = parse_tsv_frame(tsv_df, engine)
+        if use_cache:
+            tsv_cache.store(key, table)
+
+    return select_chars(table, char_list)
+
+
+# 各维度在按字列表 "all" 取字时排除的汉字
+DIMENSION_EXCLUDED = {
+    '声母': ["□", "□"],  # 排除 "□" 和 "□ □"
+    '韵母': ["□", "□"],
+    '声调': ["□", "□ □"],
+}
+
+
+def _vowel_phonetic(phonetic: str) -> str:
+    # 韵母的音标去掉开头的 ∅
+    return phonetic[1:] if phonetic.startswith("∅") else phonetic
 
+
+def _table_view(table: pd.DataFrame, column: str, char_list) -> pd.DataFrame:
+    """
+    把 parse_tsv 的结果展开成某一维度的 汉字、音标、声韵 三列。
+    """
+    if char_list == "all":
+        table = table[~table['汉字'].isin(DIMENSION_EXCLUDED[column])]
+    result_df = table[['汉字', '音标', column]].explode(column).dropna(subset=[column])
+    result_df = result_df.rename(columns={column: '声韵'}).reset_index(drop=True)
+    if column == '韵母':
+        result_df['音标'] = [_vowel_phonetic(p) for p in result_df['音标']]
     return result_df
 
 
-def get_tones_from_tsv(tsv_file_path: str, char_list: list) -> pd.DataFrame:
+def iter_readings(records, column: str):
     """
-    从TSV文件中提取与字列表匹配的所有汉字及其对应的声调。
+    把 (汉字, 音标, 声母, 韵母, 声调) 记录展开成某一维度的 (汉字, 声韵, 音标)，
+    与 get_*_from_table 返回的行一一对应（按字列表 "all" 取字）。
+    """
+    column_index = TABLE_COLUMNS.index(column)
+    excluded = set(DIMENSION_EXCLUDED[column])
+    for record in records:
+        char, phonetic = record[0], record[1]
+        if char in excluded:
+            continue
+        if column == '韵母':
+            phonetic = _vowel_phonetic(phonetic)
+        for reading in record[column_index]:
+            yield char, reading, phonetic
+
+
+def get_vowels_from_table(table: pd.DataFrame, char_list="all") -> pd.DataFrame:
+    return _table_view(table, '韵母', char_list)
+
+
+def get_consonants_from_table(table: pd.DataFrame, char_list="all") -> pd.DataFrame:
+    return _table_view(table, '声母', char_list)
+
+
+def get_tones_from_table(table: pd.DataFrame, char_list="all") -> pd.DataFrame:
+    return _table_view(table, '声调', char_list)
+
+
+def iter_tsv_records(tsv_file_path: str, chunksize: int = 5000, engine: str = "loop"):
+    """
+    分块读取TSV文件并逐条产出解析结果，内存占用只与 chunksize 有关，与文件大小无关。
 
     tsv_file_path: TSV文件路径
-    char_list: 要查找的汉字列表
+    chunksize: 每次读入的行数
+    engine: 提取引擎，见 parse_tsv_frame
 
-    返回: 包含匹配的汉字、音标和声调的DataFrame
+    产出: (汉字, 音标, 声母, 韵母, 声调) 元组，按文件中的行序（parse_tsv 则按汉字分组），
+          每个汉字的读音顺序与 parse_tsv 相同
     """
-    # 音典声调映射
-    tone_map_yindian = {
-        "1": "陰平", "1a": "陰平甲", "1b": "陰平乙", "1A": "陰平甲", "1B": "陰平乙",
-        "2": "陽平", "2a": "陽平甲", "2b": "陽平乙", "2A": "陽平甲", "2B": "陽平乙",
-        "3": "陰上", "3a": "陰上甲", "3b": "陰上乙", "3A": "陰上甲", "3B": "陰上乙",
-        "4": "陽上", "4a": "陽上甲", "4b": "陽上乙", "4A": "陽上甲", "4B": "陽上乙",
-        "5": "陰去", "5a": "陰去甲", "5b": "陰去乙", "5A": "陰去甲", "5B": "陰去乙",
-        "6": "陽去", "6a": "陽去甲", "6b": "陽去乙", "6A": "陽去甲", "6B": "陽去乙",
-        "7": "陰入", "7a": "上陰入", "7b": "下陰入", "7c": "陰入丙", "7A": "上陰入", "7B": "下陰入",
-        "8": "陽入", "8a": "上陽入", "8b": "下陽入", "8A": "上陽入", "8B": "下陽入",
-        "9": "變調", "9a": "變調1", "9b": "變調2", "0": "變調", "10": "輕聲", "輕聲": "輕聲"
-    }
-
-    # 粵拼声调映射
-    tone_map_jyutping = {
-        "1": "陰平", "2": "陰上", "3": "陰去", "4": "陽平", "5": "陽上", "6": "陽去",
-        "7": "上陰入", "8": "下陰入", "9": "陽入", "10": "下陽入", "0": "變調"
-    }
-
-    # 读取TSV文件
-    tsv_df = pd.read_csv(tsv_file_path, sep="\t")
-
-    if '#漢字' not in tsv_df.columns or '音標' not in tsv_df.columns:
+    columns = pd.read_csv(tsv_file_path, sep="\t", nrows=0).columns
+    if '#漢字' not in columns or '音標' not in columns:
         print("错误：文件缺少必要的 '#漢字' 或 '音標' 列！")
-        return pd.DataFrame()
+        return
 
-    # 获取所有汉字（去除特殊字符）
-    if char_list == "all":
-        char_list = tsv_df['#漢字'].drop_duplicates().tolist()
-        char_list = [char for char in char_list if char not in ["□", "□ □"]]
-    else:
-        char_list = list(dict.fromkeys(char_list))  # 去重保持顺序
-
-    # 判斷使用哪個聲調系統（根據“時”與“窮”）
-    def extract_tone_number(char: str) -> str:
-        row = tsv_df[tsv_df['#漢字'] == char]
-        if not row.empty:
-            phonetic = str(row.iloc[0]['音標'])
-            match = re.search(r"(\d+)", phonetic)
-            if match:
-                return match.group(1).lstrip("0")
-        return None
+    # 先只扫描两列找出“時”“窮”的第一个读音，用来判断声调系统
+    first_phonetics = {}
+    for chunk in pd.read_csv(tsv_file_path, sep="\t", usecols=['#漢字', '音標'], dtype=str, chunksize=chunksize):
+        for char, phonetic in zip(chunk['#漢字'], chunk['音標']):
+            if char in ("時", "窮") and char not in first_phonetics:
+                first_phonetics[char] = phonetic
+        if len(first_phonetics) == 2:
+            break
+    tone_map = choose_tone_map(first_phonetics.get("時"), first_phonetics.get("窮"))
 
-    tone_shi = extract_tone_number("時")
-    tone_qiong = extract_tone_number("窮")
+    for chunk in pd.read_csv(tsv_file_path, sep="\t", usecols=['#漢字', '音標'], dtype=str, chunksize=chunksize):
+        chunk = chunk[chunk['#漢字'].notna()]
+        yield from parse_rows(chunk['#漢字'].tolist(), chunk['音標'].to_numpy(), tone_map, engine)
 
-    # 判斷邏輯
-    if "2" in [tone_shi, tone_qiong]:
-        reference_tone_map = tone_map_yindian
-    elif all(tone in ["4", None] for tone in [tone_shi, tone_qiong]):
-        reference_tone_map = tone_map_jyutping
-    else:
-        reference_tone_map = tone_map_yindian
-
-    results = []
-
-    for char in char_list:
-        matched_rows = tsv_df[tsv_df['#漢字'] == char]
-        if not matched_rows.empty:
-            for _, row in matched_rows.iterrows():
-                phonetic = str(row['音標'])
-                if not phonetic or phonetic.strip() == "":
-                    continue
-
-                # 提取结尾的数字 + 可选的一个字母
-                match = re.search(r"(\d+[a-z]?)$", phonetic)
-                if match:
-                    tone_code = match.group(1).lstrip("0")  # 移除前導0以兼容 "03" -> "3"
-                    tone_name = reference_tone_map.get(tone_code, tone_map_yindian.get(tone_code, "未知"))
-                    results.append({'汉字': row['#漢字'], '音标': phonetic, '声韵': tone_name})
-
-    return pd.DataFrame(results)
+
+def get_vowels_from_tsv(tsv_file_path: str, char_list: list, engine: str = "loop") -> pd.DataFrame:
+    """
+    从TSV文件中提取与字列表匹配的所有汉字以及对应的韵母。
+
+    tsv_file_path: TSV文件路径
+    char_list: 要查找的汉字列表
+    engine: 提取引擎，"loop" 或 "vectorized"，见 parse_tsv_frame
+
+    返回: 包含匹配的汉字、音标和韵母的DataFrame
+    """
+    return get_vowels_from_table(parse_tsv(tsv_file_path, char_list, engine=engine), char_list)
+
+
+def get_consonants_from_tsv(tsv_file_path: str, char_list: list, engine: str = "loop") -> pd.DataFrame:
+    """
+    从TSV文件中提取与字列表匹配的所有汉字及其对应的声母。
+
+    tsv_file_path: TSV文件路径
+    char_list: 要查找的汉字列表
+    engine: 提取引擎，"loop" 或 "vectorized"，见 parse_tsv_frame
+
+    返回: 包含匹配的汉字和声母的DataFrame
+    """
+    return get_consonants_from_table(parse_tsv(tsv_file_path, char_list, engine=engine), char_list)
+
+
+def get_tones_from_tsv(tsv_file_path: str, char_list: list, engine: str = "loop") -> pd.DataFrame:
+    """
+    从TSV文件中提取与字列表匹配的所有汉字及其对应的声调。
+
+    tsv_file_path: TSV文件路径
+    char_list: 要查找的汉字列表
+    engine: 提取引擎，"loop" 或 "vectorized"，见 parse_tsv_frame
+
+    返回: 包含匹配的汉字、音标和声调的DataFrame
+    """
+    return get_tones_from_table(parse_tsv(tsv_file_path, char_list, engine=engine), char_list)
 
 
 # # # 本地路径与查询字列表
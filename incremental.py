@@ -0,0 +1,137 @@
+"""
+arrange 的增量缓存
+在输出目录下记一份清单：“聲韻”文件层级的指纹，以及每个TSV的大小、修改时间和对应的统计结果文件。
+再次运行时只重新解析新增或改动过的TSV，其余地点直接读回上次按叶路径统计好的结果和各分组的格子，
+写表时只需按主類查表拼行，不必重新合并、重新生成；
+“聲韻”文件、分类列、声韵维度、提取规则或模糊歸類表一变，整份缓存作废，全部重来。
+"""
+
+import hashlib
+import json
+import os
+import pickle
+
+import tsv_cache
+
+MANIFEST_VERSION = 2
+
+
+def levels_fingerprint(excel_path, category_column, column, rules_fingerprint):
+    stat = os.stat(excel_path)
+    return tsv_cache.fingerprint(
+        MANIFEST_VERSION, os.path.abspath(excel_path), stat.st_size, stat.st_mtime_ns,
+        category_column, column, rules_fingerprint,
+    )
+
+
+def _file_state(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class AggregateStore:
+    """
+    一个输出（分类列 + 维度）的增量缓存：levels 为缓存的层级结构，lookup / store 按TSV路径读写统计结果。
+    """
+
+    def __init__(self, state_dir, fingerprint):
+        self.state_dir = state_dir
+        self.fingerprint = fingerprint
+        self.manifest_path = os.path.join(state_dir, "manifest.json")
+        self.files = {}
+        self.levels = None
+        self._levels_dirty = False
+
+        manifest = self._read_manifest()
+        if manifest.get("version") == MANIFEST_VERSION and manifest.get("levels") == fingerprint:
+            self.files = manifest.get("files", {})
+            self.levels = self._read_pickle("levels.pkl")
+        elif manifest:
+            print("“聲韻”文件或设置已改动，增量缓存作废，全部重新处理。")
+            self._remove_entries(manifest.get("files", {}).values())
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"读取增量清单 {self.manifest_path} 时出错，全部重新处理: {e}")
+            return {}
+
+    def _read_pickle(self, name):
+        path = os.path.join(self.state_dir, name)
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"读取增量缓存 {path} 时出错，将重新处理: {e}")
+            return None
+
+    def _write_pickle(self, name, value):
+        path = os.path.join(self.state_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def _remove_entries(self, records):
+        for record in records:
+            try:
+                os.remove(os.path.join(self.state_dir, record["entry"]))
+            except (FileNotFoundError, KeyError):
+                pass
+
+    def set_levels(self, levels):
+        self.levels = levels
+        self._levels_dirty = True
+
+    def lookup(self, tsv_path):
+        """
+        文件大小和修改时间都与上次相同时返回缓存的统计结果，否则返回 None。
+        """
+        key = os.path.abspath(tsv_path)
+        record = self.files.get(key)
+        if record is None:
+            return None
+        try:
+            if _file_state(tsv_path) != {"size": record["size"], "mtime_ns": record["mtime_ns"]}:
+                return None
+        except OSError:
+            return None
+        return self._read_pickle(record["entry"])
+
+    def store(self, tsv_path, value):
+        key = os.path.abspath(tsv_path)
+        entry = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".pkl"
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            self._write_pickle(entry, value)
+        except OSError as e:
+            print(f"写入增量缓存时出错，跳过: {e}")
+            return
+        self.files[key] = {**_file_state(tsv_path), "entry": entry}
+
+    def prune(self):
+        """
+        删除已不存在的TSV的缓存；本次没选中但仍存在的文件保留，换分区运行时还能用上。
+        """
+        stale = [key for key in self.files if not os.path.exists(key)]
+        self._remove_entries([self.files.pop(key) for key in stale])
+
+    def save(self):
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            if self._levels_dirty:
+                self._write_pickle("levels.pkl", self.levels)
+                self._levels_dirty = False
+            manifest = {"version": MANIFEST_VERSION, "levels": self.fingerprint, "files": self.files}
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"保存增量清单时出错: {e}")
@@ -1,8 +1,7 @@
 import os
-from tkinter import filedialog
-import tkinter as tk
+import pickle
+from functools import lru_cache
 import pandas as pd
-import opencc
 
 custom_variant_dict = {
     "淸": "清",
@@ -20,31 +19,30 @@ custom_variant_dict = {
 }
 
 
-def choose_tsv_files(partition_name: str):
-    # === 选择文件阶段 ===
-    root = tk.Tk()
-    root.withdraw()
+ABBREVIATION_PATH = r"C:\\Users\\joengzaang\\myfiles\\杂文件\\声韵处理\\漢字音典字表檔案（長期更新）.csv"
+INDEX_VERSION = 1
 
-    file_paths = filedialog.askopenfilenames(
-        title="選擇 TSV 文件（可多選）",
-        filetypes=[("TSV files", "*.tsv")]
-    )
+# 匹配步驟，依次嘗試
+MATCH_STEPS = ("簡簿", "簡轉繁", "轉簡體", "異體簡化", "自定義")
 
-    if not file_paths:
-        print("未選擇任何檔案，程式結束。")
-        return
 
-    # 文件名 => 原路径映射
-    name_to_path = {
-        os.path.splitext(os.path.basename(p))[0]: p
-        for p in file_paths
-    }
+def apply_custom_variant(text):
+    for old, new in custom_variant_dict.items():
+        text = text.replace(old, new)
+    return text
 
-    original_locations = [os.path.splitext(os.path.basename(path))[0] for path in file_paths]
 
-    print(f"[調試] 選擇的原始地點：{original_locations}")
+@lru_cache(maxsize=None)
+def _converters():
+    import opencc  # 只在建立索引和匹配時才需要
+
+    return opencc.OpenCC('s2t'), opencc.OpenCC('t2s'), opencc.OpenCC('tw2sp.json')
 
-    abbreviation_path = r"C:\\Users\\joengzaang\\myfiles\\杂文件\\声韵处理\\漢字音典字表檔案（長期更新）.csv"
+
+def read_abbreviations(abbreviation_path):
+    """
+    讀取簡稱表並處理重複簡稱，返回有“簡稱”“音典分區”的行。
+    """
     abbreviation_df = pd.read_csv(abbreviation_path)
     print(f"[調試] 載入的簡稱數量：{len(abbreviation_df)}")
 
@@ -63,114 +61,194 @@ def choose_tsv_files(partition_name: str):
         abbreviation_df = abbreviation_df[
             ~((abbreviation_df['簡稱'].isin(duplicated_abbr['簡稱'])) & (abbreviation_df['是否有人在做'] == '否'))]
 
-    abbr_partition_df = abbreviation_df.dropna(subset=["簡稱", "音典分區"])
-    sort_order_abbr = abbr_partition_df["簡稱"].tolist()
-    partition_raw = abbr_partition_df["音典分區"].tolist()
-    partition_map = {
-        name: (region.split('-')[0] if '-' in region else region)
-        for name, region in zip(sort_order_abbr, partition_raw)
+    return abbreviation_df.dropna(subset=["簡稱", "音典分區"])
+
+
+class LocationIndex:
+    """
+    簡稱索引：把每個簡稱的各種寫法（原文、簡轉繁、轉簡體、異體簡化、自定義）映射回簡稱本身，
+    匹配時每一步只需查一次字典。索引以 pickle 存在簡稱表旁邊，簡稱表改動後自動重建。
+    """
+
+    def __init__(self, sort_order_abbr, partition_raw):
+        self.sort_order_abbr = []
+        self.order = {}
+        for abbr in sort_order_abbr:
+            if abbr not in self.order:
+                self.order[abbr] = len(self.sort_order_abbr)
+                self.sort_order_abbr.append(abbr)
+        self.partition_map = {
+            name: (region.split('-')[0] if '-' in region else region)
+            for name, region in zip(sort_order_abbr, partition_raw)
+        }
+
+        converter_s2t, converter_t2s, converter_variant = _converters()
+        self.forms = tuple({} for _ in MATCH_STEPS)
+        for abbr in self.sort_order_abbr:
+            abbr_forms = (
+                abbr,
+                converter_s2t.convert(abbr),
+                converter_t2s.convert(abbr),
+                converter_variant.convert(abbr),
+                apply_custom_variant(abbr),
+            )
+            for forms, form in zip(self.forms, abbr_forms):
+                forms.setdefault(form, abbr)  # 多個簡稱寫法相同時取排在前面的
+
+    @staticmethod
+    def _signature(abbreviation_path):
+        stat = os.stat(abbreviation_path)
+        return INDEX_VERSION, stat.st_size, stat.st_mtime_ns, tuple(custom_variant_dict.items())
+
+    @classmethod
+    def load(cls, abbreviation_path=ABBREVIATION_PATH):
+        """
+        讀取簡稱索引：同一進程內直接複用，簡稱表未改動時讀取旁邊的索引文件，否則重建並保存。
+        """
+        signature = cls._signature(abbreviation_path)
+        cached = _index_cache.get(abbreviation_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        index_path = f"{abbreviation_path}.index.pkl"
+        index = None
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, "rb") as f:
+                    stored_signature, stored_index = pickle.load(f)
+                if stored_signature == signature:
+                    index = stored_index
+            except Exception as e:
+                print(f"讀取簡稱索引 {index_path} 時出錯，將重新建立: {e}")
+
+        if index is None:
+            abbr_partition_df = read_abbreviations(abbreviation_path)
+            index = cls(abbr_partition_df["簡稱"].tolist(), abbr_partition_df["音典分區"].tolist())
+            try:
+                tmp_path = f"{index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump((signature, index), f)
+                os.replace(tmp_path, index_path)
+            except OSError as e:
+                print(f"保存簡稱索引時出錯，跳過: {e}")
+
+        _index_cache[abbreviation_path] = (signature, index)
+        return index
+
+    def match(self, original_locations):
+        """
+        按“簡簿 → 簡轉繁 → 轉簡體 → 異體簡化 → 自定義”逐步匹配地點名。
+
+        返回: (匹配結果 [(原地點名, 簡稱), ...]（按匹配步驟排列）, 未匹配的地點名列表)
+        """
+        converter_s2t, converter_t2s, converter_variant = _converters()
+        probes = (
+            lambda loc: loc,
+            lambda loc: loc,
+            converter_t2s.convert,
+            converter_variant.convert,
+            apply_custom_variant,
+        )
+        messages = (
+            "Step1 匹配：{loc} -> 簡簿",
+            "Step2 匹配：{loc} -> 簡簿(簡轉繁)",
+            "Step3 匹配：{loc}(轉簡體) -> 簡簿(轉簡體)",
+            "Step4 匹配：{loc}(異體簡化為 {form}) -> 簡簿(異體簡化)",
+            "Step5 匹配：{loc}(自定義轉為 {form}) -> 簡簿(自定義)",
+        )
+
+        print("=== 匹配調訊輸出 ===")
+        matches = []
+        unmatched = list(original_locations)
+        last_step = len(MATCH_STEPS) - 1
+        for step, (forms, probe, message) in enumerate(zip(self.forms, probes, messages)):
+            remaining = []
+            for loc in unmatched:
+                form = probe(loc)
+                abbr = forms.get(form)
+                if abbr is not None:
+                    matches.append((loc, abbr))
+                    print(message.format(loc=loc, form=form))
+                else:
+                    remaining.append(loc)
+                    if step == last_step:
+                        print(f"未匹配：{loc}(自定義轉為 {form})")
+            unmatched = remaining
+        return matches, unmatched
+
+    def arrange(self, matches, partition_filter_set=None):
+        """
+        按簡稱表順序排列匹配到的地點，分區變化處插入 "_" 佔位。
+
+        返回: (地點名列表, 分區列表)，地點名保持原文件中的寫法
+        """
+        ordered = sorted(
+            (self.order[abbr], i, loc, abbr)
+            for i, (loc, abbr) in enumerate(matches)
+            if partition_filter_set is None or self.partition_map.get(abbr, '') in partition_filter_set
+        )
+
+        locations = []
+        partitions = []
+        previous_partition = None
+        for _, _, loc, abbr in ordered:
+            current_partition = self.partition_map.get(abbr, '')
+            if previous_partition is not None and current_partition != previous_partition:
+                locations.append("_")
+                partitions.append("")
+            locations.append(loc)
+            partitions.append(current_partition)
+            previous_partition = current_partition
+        return locations, partitions
+
+
+_index_cache = {}
+
+
+def choose_tsv_files(partition_name: str, file_paths=None, abbreviation_path=ABBREVIATION_PATH):
+    """
+    按簡稱表排序並篩選分區。file_paths 為空時彈出文件選擇對話框。
+    """
+    if not file_paths:
+        # === 选择文件阶段 ===
+        import tkinter as tk
+        from tkinter import filedialog
+
+        root = tk.Tk()
+        root.withdraw()
+
+        file_paths = filedialog.askopenfilenames(
+            title="選擇 TSV 文件（可多選）",
+            filetypes=[("TSV files", "*.tsv")]
+        )
+
+    if not file_paths:
+        print("未選擇任何檔案，程式結束。")
+        return
+
+    # 文件名 => 原路径映射
+    name_to_path = {
+        os.path.splitext(os.path.basename(p))[0]: p
+        for p in file_paths
     }
 
-    converter_s2t = opencc.OpenCC('s2t')
-    converter_t2s = opencc.OpenCC('t2s')
-    converter_variant = opencc.OpenCC('tw2sp.json')
+    original_locations = [os.path.splitext(os.path.basename(path))[0] for path in file_paths]
 
-    def apply_custom_variant(text):
-        for old, new in custom_variant_dict.items():
-            text = text.replace(old, new)
-        return text
+    print(f"[調試] 選擇的原始地點：{original_locations}")
+
+    index = LocationIndex.load(abbreviation_path)
 
-    matched_locations = []
-    matched_set = set()
-    unmatched_locations_step1 = []
     # 解析篩選條件
     partition_filter_set = None
     if partition_name.strip() != "全部":
         selected_parts = partition_name.strip().split()
         partition_filter_set = set(selected_parts)
         print(f"[調試] 篩選分區：{partition_filter_set}")
-    print("=== 匹配調訊輸出 ===")
 
-    for loc in original_locations:
-        if loc in sort_order_abbr:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step1 匹配：{loc} -> 簡簿")
-        else:
-            unmatched_locations_step1.append(loc)
-
-    sort_order_abbr_trad = [converter_s2t.convert(x) for x in sort_order_abbr]
-    unmatched_locations_step2 = []
-    for loc in unmatched_locations_step1:
-        if loc in sort_order_abbr_trad:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step2 匹配：{loc} -> 簡簿(簡轉繁)")
-        else:
-            unmatched_locations_step2.append(loc)
-
-    sort_order_abbr_simp = [converter_t2s.convert(x) for x in sort_order_abbr]
-    unmatched_locations_step3 = []
-    for loc in unmatched_locations_step2:
-        loc_simp = converter_t2s.convert(loc)
-        if loc_simp in sort_order_abbr_simp:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step3 匹配：{loc}(轉簡體) -> 簡簿(轉簡體)")
-        else:
-            unmatched_locations_step3.append(loc)
-
-    abbr_variant_set = set(converter_variant.convert(x) for x in sort_order_abbr)
-    unmatched_locations_step4 = []
-    for loc in unmatched_locations_step3:
-        loc_var = converter_variant.convert(loc)
-        if loc_var in abbr_variant_set:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step4 匹配：{loc}(異體簡化為 {loc_var}) -> 簡簿(異體簡化)")
-        else:
-            unmatched_locations_step4.append(loc)
-
-    abbr_custom_set = set(apply_custom_variant(x) for x in sort_order_abbr)
-    unmatched_locations = []
-    for loc in unmatched_locations_step4:
-        loc_custom = apply_custom_variant(loc)
-        if loc_custom in abbr_custom_set:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step5 匹配：{loc}(自定義轉為 {loc_custom}) -> 簡簿(自定義)")
-        else:
-            unmatched_locations.append(loc)
-            print(f"未匹配：{loc}(自定義轉為 {loc_custom})")
-
-    # sorted_matched = [abbr for abbr in sort_order_abbr if abbr in matched_set]
-    sorted_matched = [
-        abbr for abbr in sort_order_abbr
-        if abbr in matched_set and (
-                partition_filter_set is None or partition_map.get(abbr, '') in partition_filter_set
-        )
-    ]
-
-    locations = []
-    partitions = []
-    sorted_paths = []
-    previous_partition = None
-    for loc in sorted_matched:
-        current_partition = partition_map.get(loc, '')
-        if previous_partition is not None and current_partition != previous_partition:
-            locations.append("_")
-            sorted_paths.append("_")
-            partitions.append("")
-        locations.append(loc)
-        sorted_paths.append(name_to_path[loc])
-        partitions.append(current_partition)
-        previous_partition = current_partition
-
-    # if unmatched_locations:
-        # locations.append("__")
-        # partitions.append("")
-        # locations.extend(unmatched_locations)
-        # partitions.extend([''] * len(unmatched_locations))
+    matches, unmatched_locations = index.match(original_locations)
+    matched_locations = [loc for loc, _ in matches]
+    locations, partitions = index.arrange(matches, partition_filter_set)
+    sorted_paths = [loc if loc == "_" else name_to_path[loc] for loc in locations]
 
     print("\n=== 最終排序結果 ===")
     for loc, part in zip(locations, partitions):
@@ -185,113 +263,12 @@ def choose_tsv_files(partition_name: str):
     return sorted_paths, locations, partitions
 
 
-def process_and_sort_locations(original_locations):
-    abbreviation_path = r"C:\\Users\\joengzaang\\myfiles\\杂文件\\声韵处理\\漢字音典字表檔案（長期更新）.csv"
-    abbreviation_df = pd.read_csv(abbreviation_path)
+def process_and_sort_locations(original_locations, abbreviation_path=ABBREVIATION_PATH):
+    index = LocationIndex.load(abbreviation_path)
 
-    # 檢查簡稱是否有重複
-    duplicated_abbr = abbreviation_df[abbreviation_df.duplicated(subset=['簡稱'], keep=False)]
-    if not duplicated_abbr.empty:
-        filtered = duplicated_abbr[duplicated_abbr['是否有人在做'] != '否']
-        if filtered.empty:
-            print("所有重複簡稱都標記為'否'，自動忽略。")
-        else:
-            print("[警告] 以下簡稱有重複，且'是否有人在做'不為'否'：")
-            print(filtered[['簡稱']])
-            proceed = input("是否繼續執行？(y/n)：")
-            if proceed.lower() != 'y':
-                raise SystemExit("中止執行，請處理簡稱重複問題後再試。")
-        abbreviation_df = abbreviation_df[
-            ~((abbreviation_df['簡稱'].isin(duplicated_abbr['簡稱'])) & (abbreviation_df['是否有人在做'] == '否'))]
-
-    abbr_partition_df = abbreviation_df.dropna(subset=["簡稱", "音典分區"])
-
-    sort_order_abbr = abbr_partition_df["簡稱"].tolist()
-    partition_raw = abbr_partition_df["音典分區"].tolist()
-    partition_map = {
-        name: (region.split('-')[0] if '-' in region else region)
-        for name, region in zip(sort_order_abbr, partition_raw)
-    }
-
-    converter_s2t = opencc.OpenCC('s2t')
-    converter_t2s = opencc.OpenCC('t2s')
-    converter_variant = opencc.OpenCC('tw2sp.json')
-
-    def apply_custom_variant(text):
-        for old, new in custom_variant_dict.items():
-            text = text.replace(old, new)
-        return text
-
-    matched_locations = []
-    matched_set = set()
-    unmatched_locations_step1 = []
-    print("=== 匹配調訊輸出 ===")
-
-    for loc in original_locations:
-        if loc in sort_order_abbr:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step1 匹配：{loc} -> 簡簿")
-        else:
-            unmatched_locations_step1.append(loc)
-
-    sort_order_abbr_trad = [converter_s2t.convert(x) for x in sort_order_abbr]
-    unmatched_locations_step2 = []
-    for loc in unmatched_locations_step1:
-        if loc in sort_order_abbr_trad:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step2 匹配：{loc} -> 簡簿(簡轉繁)")
-        else:
-            unmatched_locations_step2.append(loc)
-
-    sort_order_abbr_simp = [converter_t2s.convert(x) for x in sort_order_abbr]
-    unmatched_locations_step3 = []
-    for loc in unmatched_locations_step2:
-        loc_simp = converter_t2s.convert(loc)
-        if loc_simp in sort_order_abbr_simp:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step3 匹配：{loc}(轉簡體) -> 簡簿(轉簡體)")
-        else:
-            unmatched_locations_step3.append(loc)
-
-    abbr_variant_set = set(converter_variant.convert(x) for x in sort_order_abbr)
-    unmatched_locations_step4 = []
-    for loc in unmatched_locations_step3:
-        loc_var = converter_variant.convert(loc)
-        if loc_var in abbr_variant_set:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step4 匹配：{loc}(異體簡化為 {loc_var}) -> 簡簿(異體簡化)")
-        else:
-            unmatched_locations_step4.append(loc)
-
-    abbr_custom_set = set(apply_custom_variant(x) for x in sort_order_abbr)
-    unmatched_locations = []
-    for loc in unmatched_locations_step4:
-        loc_custom = apply_custom_variant(loc)
-        if loc_custom in abbr_custom_set:
-            matched_locations.append(loc)
-            matched_set.add(loc)
-            print(f"Step5 匹配：{loc}(自定義轉為 {loc_custom}) -> 簡簿(自定義)")
-        else:
-            unmatched_locations.append(loc)
-            print(f"未匹配：{loc}(自定義轉為 {loc_custom})")
-
-    sorted_matched = [abbr for abbr in sort_order_abbr if abbr in matched_set]
-
-    locations = []
-    partitions = []
-    previous_partition = None
-    for loc in sorted_matched:
-        current_partition = partition_map.get(loc, '')
-        if previous_partition is not None and current_partition != previous_partition:
-            locations.append("_")
-            partitions.append("")
-        locations.append(loc)
-        partitions.append(current_partition)
-        previous_partition = current_partition
+    matches, unmatched_locations = index.match(original_locations)
+    matched_locations = [loc for loc, _ in matches]
+    locations, partitions = index.arrange(matches)
 
     if unmatched_locations:
         locations.append("__")
@@ -299,7 +276,7 @@ def process_and_sort_locations(original_locations):
         locations.extend(unmatched_locations)
         partitions.extend([''] * len(unmatched_locations))
 
-    return locations, partitions, matched_locations, unmatched_locations, partition_map
+    return locations, partitions, matched_locations, unmatched_locations, index.partition_map
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,43 @@
+"""
+聲韻模糊歸類
+把模糊歸類表（每類一個主聲韻和歸入該類的聲韻）用並查集編譯成 {聲韻: 主聲韻} 的查表映射，並記下有成員的主聲韻。
+同一聲韻列在多類中時以最後一類為準（如 xʱ 先列在 h 類、後列在 x 類，歸入 x）；
+主聲韻本身又被列入別的類時，整類隨之併入那一類。
+"""
+
+
+class MergeClasses:
+    def __init__(self, table):
+        """
+        table: [(主聲韻, [聲韻, ...]), ...]，按先後順序排列
+        """
+        # 同一聲韻出現在多類時以最後一類為準
+        owner = {}
+        for head, members in table:
+            for member in members:
+                owner[member] = head
+
+        parent = {}
+
+        def find(symbol):
+            root = symbol
+            while parent.setdefault(root, root) != root:
+                root = parent[root]
+            while parent[symbol] != root:  # 路徑壓縮
+                parent[symbol], symbol = root, parent[symbol]
+            return root
+
+        for head, _ in table:
+            find(head)
+        for member, head in owner.items():
+            member_root, head_root = find(member), find(head)
+            if member_root != head_root:
+                parent[member_root] = head_root
+
+        # 映射只保留表中列出的聲韻；roots 為有成員的主聲韻，只有這些主類需要記錄子類
+        self.mapping = {member: find(member) for member in owner}
+        self.roots = frozenset(self.mapping.values())
+
+    def get(self, symbol, default=None):
+        # 與 dict.get 相同，可以代替 {原聲韻: 主聲韻} 的字典傳入
+        return self.mapping.get(symbol, default)
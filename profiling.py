@@ -0,0 +1,205 @@
+"""
+分阶段计时与内存统计
+用 stage() 上下文管理器或 profiled() 装饰器包住各处理阶段，记录墙钟时间、CPU时间（含已结束的子进程）、
+阶段内新增的峰值内存和处理条数，同名阶段累加（峰值内存取各次中最大的）。最后用 summary() 打印汇总表，或用 save_json() 写成 JSON。
+新增峰值内存是阶段内常驻内存的最高值比进入阶段时多出多少（不含多进程解析的子进程）：Linux 上进入阶段时
+重置本进程的峰值（/proc/self/clear_refs）；其他系统只能取整个进程的峰值，记的是本阶段把峰值抬高了多少。
+阶段可以嵌套，外层阶段的时间和峰值包含内层。
+默认关闭：设置环境变量 PHONOLOGY_PROFILE=1 或调用 enable() 开启，关闭时 stage() 只返回一个什么也不做的对象。
+"""
+
+import functools
+import json
+import os
+import sys
+import time
+
+ENABLED = os.environ.get("PHONOLOGY_PROFILE", "") not in ("", "0")
+
+_stats = {}  # 阶段名 -> {"calls", "wall", "cpu", "items", "peak_mem"}，按首次出现的顺序
+_open_stages = []  # 正在进行的阶段，由外到内
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def reset():
+    _stats.clear()
+
+
+def _cpu_time():
+    # 子进程（多进程解析）的CPU时间在进程池关闭、子进程被回收后才计入
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+_proc_files = {}  # 进程号 -> (/proc/self/status, /proc/self/clear_refs) 的文件描述符，每个阶段都要读写，保持打开
+
+
+def _proc_fds():
+    # 按进程号缓存：多进程 fork 出的子进程要打开自己的 /proc/self
+    pid = os.getpid()
+    fds = _proc_files.get(pid)
+    if fds is None:
+        try:
+            status = os.open("/proc/self/status", os.O_RDONLY)
+        except OSError:
+            status = None
+        try:
+            clear_refs = os.open("/proc/self/clear_refs", os.O_WRONLY)
+        except OSError:
+            clear_refs = None
+        fds = _proc_files[pid] = (status, clear_refs)
+    return fds
+
+
+def _memory():
+    """
+    本进程的 (当前常驻内存, 峰值常驻内存)，单位字节；当前值取不到时为 None，都取不到时返回 (None, None)。
+    """
+    status_fd = _proc_fds()[0]
+    if status_fd is not None:
+        status = os.pread(status_fd, 4096, 0)
+        rss, hwm = status.index(b"VmRSS:") + 6, status.index(b"VmHWM:") + 6
+        return int(status[rss:status.index(b"kB", rss)]) * 1024, int(status[hwm:status.index(b"kB", hwm)]) * 1024
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None, None
+        return None, getattr(psutil.Process().memory_info(), "peak_wset", None)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return None, peak if sys.platform == "darwin" else peak * 1024
+
+
+def _reset_peak():
+    # 把本进程的峰值常驻内存重置为当前值（Linux）；不支持时返回 False
+    clear_refs_fd = _proc_fds()[1]
+    if clear_refs_fd is None:
+        return False
+    try:
+        os.write(clear_refs_fd, b"5")
+        return True
+    except OSError:
+        return False
+
+
+def _fold_peak():
+    # 进程只有一个峰值：重置前先把它记到所有进行中的阶段上，内层阶段重置峰值不影响外层
+    if not _open_stages:
+        return
+    _, peak = _memory()
+    if peak is not None:
+        for open_stage in _open_stages:
+            open_stage.peak = max(open_stage.peak, peak)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, n=1):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+
+    def count(self, n=1):
+        self.items += n
+
+    def __enter__(self):
+        _fold_peak()
+        current, peak = _memory() if _reset_peak() else (None, _memory()[1])
+        # 重置成功时以当前值为起点，否则以进程峰值为起点
+        self.start_mem = current if current is not None else peak
+        self.peak = self.start_mem or 0
+        _open_stages.append(self)
+        self.wall = time.perf_counter()
+        self.cpu = _cpu_time()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = _cpu_time() - self.cpu
+        _fold_peak()
+        _open_stages.remove(self)
+        stats = _stats.setdefault(self.name, {"calls": 0, "wall": 0.0, "cpu": 0.0, "items": 0, "peak_mem": 0})
+        stats["calls"] += 1
+        stats["wall"] += wall
+        stats["cpu"] += cpu
+        stats["items"] += self.items
+        if self.start_mem is not None:
+            stats["peak_mem"] = max(stats["peak_mem"], self.peak - self.start_mem)
+        return False
+
+
+def stage(name, items=0):
+    """
+    计时一个阶段：with stage("保存"): ...；处理条数可在开始时给出，或在块内用 .count(n) 累加。
+    """
+    if not ENABLED:
+        return _NULL_STAGE
+    return _Stage(name, items)
+
+
+def profiled(name, items=None):
+    """
+    装饰器版的 stage()。items 为可选函数，用返回值算出处理条数，例如 items=len。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Stage(name, 0) as timer:
+                result = func(*args, **kwargs)
+                if items is not None:
+                    timer.count(items(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def report():
+    """
+    返回各阶段的统计：[{"stage", "calls", "wall_s", "cpu_s", "peak_mem_mb", "items"}, ...]。
+    """
+    return [
+        {
+            "stage": name,
+            "calls": stats["calls"],
+            "wall_s": round(stats["wall"], 4),
+            "cpu_s": round(stats["cpu"], 4),
+            "peak_mem_mb": round(stats["peak_mem"] / 1024 ** 2, 1),
+            "items": stats["items"],
+        }
+        for name, stats in _stats.items()
+    ]
+
+
+def summary():
+    lines = [f"{'阶段':<16}{'次数':>8}{'墙钟(s)':>10}{'CPU(s)':>10}{'新增峰值内存(MB)':>14}{'条数':>10}"]
+    for row in report():
+        lines.append(
+            f"{row['stage']:<16}{row['calls']:>8}{row['wall_s']:>10.3f}{row['cpu_s']:>10.3f}"
+            f"{row['peak_mem_mb']:>14.1f}{row['items']:>10}"
+        )
+    return "\n".join(lines)
+
+
+def save_json(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(), f, ensure_ascii=False, indent=2)
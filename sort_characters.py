@@ -1,191 +1,176 @@
-def processing_examples_vowels(tsv_df, vowel_file_path):
-    import pandas as pd
-    import re
-    from collections import Counter
+"""
+按“例字”文件逐行统计每个TSV中例字的韵母/声母
+例字表按路径和修改时间编译一次（拆好“/”分块），正则在导入时编译，
+每个TSV只建一次字索引，读音的韵母/声母提取结果按音标缓存。
+"""
 
-    # 定义元音列表
-    vowels = ['i', 'y', 'ɨ', 'ʉ', 'ɯ', 'u', 'ɪ', 'ʏ', 'ɿ', 'ʅ', 'ʊ',
-              'e', 'ø', 'ɘ', 'ə', 'ɵ', 'ɤ', 'o', 'ɛ', 'œ', 'ɜ', 'ɞ',
-              'ʌ', 'ɔ', 'æ', 'a', 'ɶ', 'ɑ', 'ɒ', 'ɐ', 'ε', 'ᴀ']
+import os
+import re
+from collections import Counter
+from functools import lru_cache
 
-    # 元音正则表达式
-    vowel_pattern = r"[iyɨʉɯuɪʏɿʅʅɭıɪſɩɷʮɥʯʊeɘɵəɤoɛεɝɚᴇœɜɞʌɔæaɶɑɒᴀɐãẽĩỹõʒúαᵊⁱ◌∅ø]"
-    all_results = []
+import pandas as pd
 
-    # 检查 '#漢字' 列是否存在
-    if '#漢字' not in tsv_df.columns:
-        print("错误：找不到 '#漢字' 列，请检查文件结构！")
-        return pd.DataFrame()
+from gets import build_char_index
 
-    # 读取例字数据
-    example_df = pd.read_excel(vowel_file_path)
+# 元音正则表达式（韵母）
+VOWEL_PATTERN = re.compile(r"[iyɨʉɯuɪʏɿʅʅɭıɪſɩɷʮɥʯʊeɘɵəɤoɛεɝɚᴇœɜɞʌɔæaɶɑɒᴀɐãẽĩỹõʒúαᵊⁱ◌∅ø]")
+# 元音正则表达式（声母）
+CONSONANT_VOWEL_PATTERN = re.compile(r"([iyɨʉɯuɪʏɿʅʊeøɘəɵɤoɛœɜɞʌɔæaɶɑɒɐ])")
+BRACKET_PATTERN = re.compile(r'[(){}]')
 
-    # 遍历每一行例字
-    for index, row in example_df.iterrows():
-        cell_value = row['例字']
+
+@lru_cache(maxsize=8)
+def _compile_examples(vowel_file_path, mtime_ns):
+    """
+    编译例字表：[(行号, 例字, 分块)]，例字为空的行分块为 None。
+    """
+    example_df = pd.read_excel(vowel_file_path)
+    compiled = []
+    for index, cell_value in zip(example_df.index, example_df['例字']):
         if pd.isnull(cell_value) or cell_value.strip() == "":
-            print(f"第 {index} 行的 '例字' 为空，跳过")  # 调试输出
-            all_results.append({"例字": row['例字'], "声韵": "", "批注": ""})
+            compiled.append((index, cell_value, None))
             continue
-
-        rhymes_parts = []
-        annotation_parts = []
         blocks = cell_value.split('/') if '/' in cell_value else [cell_value]
+        compiled.append((index, cell_value, tuple(blocks)))
+    return tuple(compiled)
 
-        for part in blocks:
-            rhymes = []
-            rhymes_with_characters = []
 
-            for char in part:
-                if char in tsv_df['#漢字'].values:
-                    phonetics = tsv_df[tsv_df['#漢字'] == char]['音標'].values
-                    for phonetic in phonetics:
-                        if not phonetic:
-                            continue
-
-                        # 去除括号内容
-                        phonetic = re.sub(r'[(){}]', '', phonetic)
-
-                        # 以 / 分段
-                        segments = phonetic.split('/')
-                        for segment in segments:
-                            if not segment.strip():
-                                continue
+def compile_examples(vowel_file_path):
+    """
+    读取并编译例字表，同一文件未修改时直接复用上次的结果。
+    """
+    return _compile_examples(os.path.abspath(vowel_file_path), os.stat(vowel_file_path).st_mtime_ns)
 
-                            block_rhymes = []
-                            vowel_found = False
-
-                            # 提取韵母：从第一个元音开始到遇到数字或空格为止
-                            for ch in segment:
-                                if re.match(vowel_pattern, ch) and not vowel_found:
-                                    vowel_found = True
-                                    block_rhymes.append(ch)
-                                elif vowel_found and (ch.isdigit() or ch.isspace()):
-                                    break
-                                elif vowel_found:
-                                    block_rhymes.append(ch)
-
-                            if block_rhymes:
-                                rhyme_str = ''.join(block_rhymes)
-                                rhymes.append(rhyme_str)
-                                rhymes_with_characters.append(f"{char}: {rhyme_str}")
-
-            # 如果没有提取出韵母
-            if not rhymes:
-                print(f"第 {index} 行的 {part} 没有韵母，跳过")  # 调试输出
-                rhymes_parts.append("")
-                annotation_parts.append("")
-                continue
 
-            # 统计韵母出现次数
-            rhyme_count = Counter(rhymes)
-            most_common_rhyme, _ = rhyme_count.most_common(1)[0]
-
-            # 构建与最常见韵母不同的批注
-            different_rhymes = []
-            for rhyme, count in rhyme_count.items():
-                if rhyme != most_common_rhyme:
-                    chars = [item.split(': ')[0] for item in rhymes_with_characters if item.split(': ')[1] == rhyme]
-                    different_rhymes.append(f"{rhyme}: {','.join(chars)}")
-
-            annotation = "，".join(different_rhymes) if different_rhymes else ""
-            rhymes_parts.append(most_common_rhyme)
-            annotation_parts.append(annotation)
+@lru_cache(maxsize=None)
+def _vowel_rhymes(phonetic):
+    """
+    提取一个读音里各段的韵母：从第一个元音开始到遇到数字或空格为止。
+    """
+    # 去除括号内容
+    phonetic = BRACKET_PATTERN.sub('', phonetic)
 
-        # 存储结果
-        all_results.append({
-            "例字": row['例字'],
-            "声韵": "/".join(rhymes_parts),
-            "批注": " ".join(annotation_parts)
-        })
-
-    return pd.DataFrame(all_results)
-
-
-def processing_examples_consonants(tsv_df, vowel_file_path):
-    import pandas as pd
-    import re
-    from collections import Counter
-
-    # 定义元音列表
-    vowels = ['i', 'y', 'ɨ', 'ʉ', 'ɯ', 'u', 'ɪ', 'ʏ', 'ɿ', 'ʅ', 'ʊ',
-              'e', 'ø', 'ɘ', 'ə', 'ɵ', 'ɤ', 'o', 'ɛ', 'œ', 'ɜ', 'ɞ',
-              'ʌ', 'ɔ', 'æ', 'a', 'ɶ', 'ɑ', 'ɒ', 'ɐ']
-
-    vowel_pattern = r"([iyɨʉɯuɪʏɿʅʊeøɘəɵɤoɛœɜɞʌɔæaɶɑɒɐ])"
-    all_results = []
+    rhymes = []
+    # 以 / 分段
+    for segment in phonetic.split('/'):
+        if not segment.strip():
+            continue
 
+        block_rhymes = []
+        vowel_found = False
+        for ch in segment:
+            if VOWEL_PATTERN.match(ch) and not vowel_found:
+                vowel_found = True
+                block_rhymes.append(ch)
+            elif vowel_found and (ch.isdigit() or ch.isspace()):
+                break
+            elif vowel_found:
+                block_rhymes.append(ch)
+
+        if block_rhymes:
+            rhymes.append(''.join(block_rhymes))
+    return tuple(rhymes)
+
+
+@lru_cache(maxsize=None)
+def _consonant(phonetic):
+    """
+    提取一个读音的声母。
+    """
+    phonetic = BRACKET_PATTERN.sub('', phonetic)  # 去除括号等
+
+    if CONSONANT_VOWEL_PATTERN.match(phonetic[0]):
+        return "∅"
+    if not CONSONANT_VOWEL_PATTERN.search(phonetic) and phonetic[0] in ['m', 'n', 'ŋ']:
+        return "∅"
+    if not CONSONANT_VOWEL_PATTERN.search(phonetic):
+        return phonetic[0]
+    consonant = ""
+    for ch in phonetic:
+        if CONSONANT_VOWEL_PATTERN.match(ch):
+            break
+        consonant += ch
+    return consonant
+
+
+def _summarize(values_with_characters):
+    """
+    取出现最多的一项，并为其他项生成批注“项: 字,字”。
+    """
+    value_count = Counter(value for _, value in values_with_characters)
+    most_common_value, _ = value_count.most_common(1)[0]
+
+    chars_by_value = {}
+    for char, value in values_with_characters:
+        chars_by_value.setdefault(value, []).append(char)
+
+    different_values = [
+        f"{value}: {','.join(chars_by_value[value])}"
+        for value in value_count
+        if value != most_common_value
+    ]
+    return most_common_value, "，".join(different_values)
+
+
+def _process_examples(tsv_df, vowel_file_path, extract, label):
+    # 检查 '#漢字' 列是否存在
     if '#漢字' not in tsv_df.columns:
         print("错误：找不到 '#漢字' 列，请检查文件结构！")
         return pd.DataFrame()
 
-    example_df = pd.read_excel(vowel_file_path)
+    examples = compile_examples(vowel_file_path)
+    char_index = build_char_index(tsv_df)
+    phonetic_values = tsv_df['音標'].to_numpy()
+    char_cache = {}  # 字 -> [(字, 韵母/声母), ...]，同一个字在多行例字中只提取一次
+    all_results = []
 
-    for index, row in example_df.iterrows():
-        cell_value = row['例字']
-        if pd.isnull(cell_value) or cell_value.strip() == "":
-            print(f"第 {index} 行的 '例字' 为空，跳过")
-            all_results.append({"例字": row['例字'], "声韵": "", "批注": ""})
+    # 遍历每一行例字
+    for index, cell_value, blocks in examples:
+        if blocks is None:
+            print(f"第 {index} 行的 '例字' 为空，跳过")  # 调试输出
+            all_results.append({"例字": cell_value, "声韵": "", "批注": ""})
             continue
 
-        consonants_parts = []
+        value_parts = []
         annotation_parts = []
-        blocks = cell_value.split('/') if '/' in cell_value else [cell_value]
 
         for part in blocks:
-            consonants = []
-            consonants_with_characters = []
-
+            values_with_characters = []
             for char in part:
-                if char in tsv_df['#漢字'].values:
-                    matched_rows = tsv_df[tsv_df['#漢字'] == char]
-                    for _, match_row in matched_rows.iterrows():
-                        phonetic = match_row['音標']
-                        if not phonetic:
-                            continue
-
-                        phonetic = re.sub(r'[(){}]', '', phonetic)  # 去除括号等
-
-                        # 提取声母逻辑
-                        if re.match(vowel_pattern, phonetic[0]):
-                            consonant = "∅"
-                        elif not re.search(vowel_pattern, phonetic) and phonetic[0] in ['m', 'n', 'ŋ']:
-                            consonant = "∅"
-                        elif not re.search(vowel_pattern, phonetic):
-                            consonant = phonetic[0]
-                        else:
-                            consonant = ""
-                            for ch in phonetic:
-                                if re.match(vowel_pattern, ch):
-                                    break
-                                consonant += ch
-
-                        consonants.append(consonant)
-                        consonants_with_characters.append(f"{char}: {consonant}")
-
-            if not consonants:
-                print(f"第 {index} 行的 {part} 没有声母，跳过")
-                consonants_parts.append("")
+                if char not in char_cache:
+                    found = []
+                    if char in char_index:
+                        for phonetic in phonetic_values[char_index[char]]:
+                            if not phonetic:
+                                continue
+                            found.extend((char, value) for value in extract(phonetic))
+                    char_cache[char] = found
+                values_with_characters.extend(char_cache[char])
+
+            if not values_with_characters:
+                print(f"第 {index} 行的 {part} 没有{label}，跳过")  # 调试输出
+                value_parts.append("")
                 annotation_parts.append("")
                 continue
 
-            consonant_count = Counter(consonants)
-            most_common_consonant, _ = consonant_count.most_common(1)[0]
-
-            different_consonants = []
-            for cons, count in consonant_count.items():
-                if cons != most_common_consonant:
-                    chars = [item.split(': ')[0] for item in consonants_with_characters if item.split(': ')[1] == cons]
-                    different_consonants.append(f"{cons}: {','.join(chars)}")
-
-            annotation = "，".join(different_consonants) if different_consonants else ""
-            consonants_parts.append(most_common_consonant)
+            most_common_value, annotation = _summarize(values_with_characters)
+            value_parts.append(most_common_value)
             annotation_parts.append(annotation)
 
+        # 存储结果
         all_results.append({
-            "例字": row['例字'],
-            "声韵": "/".join(consonants_parts),
+            "例字": cell_value,
+            "声韵": "/".join(value_parts),
             "批注": " ".join(annotation_parts)
         })
 
     return pd.DataFrame(all_results)
+
+
+def processing_examples_vowels(tsv_df, vowel_file_path):
+    return _process_examples(tsv_df, vowel_file_path, _vowel_rhymes, "韵母")
+
+
+def processing_examples_consonants(tsv_df, vowel_file_path):
+    return _process_examples(tsv_df, vowel_file_path, lambda phonetic: (_consonant(phonetic),), "声母")
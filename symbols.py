@@ -0,0 +1,142 @@
+"""
+全语料共用的符号表
+把所有地点出现过的字、声韵、音标各自编成从 0 开始的整数，每个地点只存几列整数数组（array，可零拷贝转成 NumPy），
+同一个字、同一个声韵在内存里只有一份字符串，内存随不同符号的数量增长，而不是随 地点数 × 字数 增长。
+LocationReadings 仍可像 {字: [(声韵, 音标), ...]} 一样按字取读音，arrange 的代码不必改动；
+distance 直接用其中的整数数组计数、比较，整个处理过程共用一个 SymbolCorpus。
+"""
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class SymbolTable:
+    """
+    字符串 <-> 整数编号，编号按首次出现的顺序分配。
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.symbols = []
+
+    def intern(self, symbol):
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def get_id(self, symbol):
+        return self.ids.get(symbol)
+
+    def __getitem__(self, symbol_id):
+        return self.symbols[symbol_id]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def decode(self, symbol_ids):
+        symbols = self.symbols
+        return [symbols[i] for i in symbol_ids]
+
+
+class SymbolCorpus:
+    """
+    一次处理中所有地点共用的三张符号表：字（chars）、声韵（phones）、音标（readings）。
+    """
+
+    def __init__(self):
+        self.chars = SymbolTable()
+        self.phones = SymbolTable()
+        self.readings = SymbolTable()
+
+    def compact(self, phonetic_map):
+        """
+        把 {字: [(声韵, 音标), ...]} 编成整数数组，字和每个字的读音都保持原来的顺序。
+        """
+        char_ids = array("i")
+        starts = array("i", [0])
+        phone_ids = array("i")
+        reading_ids = array("i")
+        intern_char, intern_phone, intern_reading = self.chars.intern, self.phones.intern, self.readings.intern
+        for char, phonetics in phonetic_map.items():
+            char_ids.append(intern_char(char))
+            for phone, reading in phonetics:
+                phone_ids.append(intern_phone(phone))
+                reading_ids.append(intern_reading(reading))
+            starts.append(len(phone_ids))
+        return LocationReadings(self, char_ids, starts, phone_ids, reading_ids)
+
+
+class LocationReadings(Mapping):
+    """
+    一个地点的 {字: [(声韵, 音标), ...]}，以整数数组存储。
+    第 k 个字是 char_ids[k]，它的读音在 phone_ids / reading_ids 的 starts[k]:starts[k + 1] 之间；
+    sorted_ids 是按编号排好的 char_ids，sorted_positions[i] 是 sorted_ids[i] 在 char_ids 中的位置，
+    按字查读音时二分查找，索引只与本地点的字数有关，不随全语料的字数增长。
+    """
+
+    __slots__ = ("corpus", "char_ids", "starts", "phone_ids", "reading_ids", "sorted_ids", "sorted_positions")
+
+    def __init__(self, corpus, char_ids, starts, phone_ids, reading_ids):
+        self.corpus = corpus
+        self.char_ids = char_ids
+        self.starts = starts
+        self.phone_ids = phone_ids
+        self.reading_ids = reading_ids
+        order = sorted(range(len(char_ids)), key=char_ids.__getitem__)
+        self.sorted_ids = array("i", [char_ids[k] for k in order])
+        self.sorted_positions = array("i", order)
+
+    def _position(self, char):
+        char_id = self.corpus.chars.ids.get(char)
+        if char_id is None:
+            return -1
+        i = bisect_left(self.sorted_ids, char_id)
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == char_id:
+            return self.sorted_positions[i]
+        return -1
+
+    def _readings(self, position):
+        phones, readings = self.corpus.phones.symbols, self.corpus.readings.symbols
+        start, stop = self.starts[position], self.starts[position + 1]
+        return [(phones[p], readings[r]) for p, r in zip(self.phone_ids[start:stop], self.reading_ids[start:stop])]
+
+    def get(self, char, default=None):
+        position = self._position(char)
+        return default if position < 0 else self._readings(position)
+
+    def __getitem__(self, char):
+        position = self._position(char)
+        if position < 0:
+            raise KeyError(char)
+        return self._readings(position)
+
+    def __contains__(self, char):
+        return self._position(char) >= 0
+
+    def __iter__(self):
+        return iter(self.corpus.chars.decode(self.char_ids))
+
+    def __len__(self):
+        return len(self.char_ids)
+
+    def items(self):
+        chars = self.corpus.chars.symbols
+        for position, char_id in enumerate(self.char_ids):
+            yield chars[char_id], self._readings(position)
+
+    def char_index(self):
+        """
+        (sorted_ids, sorted_positions) 的 NumPy 视图，可用 np.searchsorted 一次查出一批字的位置。
+        """
+        return np.frombuffer(self.sorted_ids, dtype=np.intc), np.frombuffer(self.sorted_positions, dtype=np.intc)
+
+    def start_array(self):
+        return np.frombuffer(self.starts, dtype=np.intc)
+
+    def phone_id_array(self):
+        return np.frombuffer(self.phone_ids, dtype=np.intc)
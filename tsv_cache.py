@@ -0,0 +1,97 @@
+"""
+TSV解析结果的磁盘缓存
+以“文件路径 + 文件大小 + 修改时间 + 提取规则指纹”为键，把 gets.parse_tsv 解析出的整表存为 pickle，
+文件未改动、提取规则（元音表、替换表等）也未改动时直接读回，不再重新跑正则循环。
+缓存目录可用环境变量 PHONOLOGY_CACHE_DIR 指定，总大小超过 CACHE_MAX_BYTES 时按最近使用时间淘汰。
+"""
+
+import hashlib
+import os
+
+import pandas as pd
+
+CACHE_DIR = os.environ.get(
+    "PHONOLOGY_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "process_phonology"),
+)
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def fingerprint(*rules) -> str:
+    """
+    把提取规则（版本号、正则、替换表……）压成一个短指纹，规则一变缓存即失效。
+    """
+    return hashlib.sha1(repr(rules).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(tsv_file_path: str, rules_fingerprint: str) -> str:
+    stat = os.stat(tsv_file_path)
+    raw = f"{os.path.abspath(tsv_file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{rules_fingerprint}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key: str, cache_dir: str) -> str:
+    return os.path.join(cache_dir, f"{key}.pkl")
+
+
+def load(key: str, cache_dir: str = None):
+    """
+    读取缓存，不存在或已损坏时返回 None。命中时刷新修改时间，作为LRU的“最近使用”。
+    """
+    path = _entry_path(key, cache_dir or CACHE_DIR)
+    if not os.path.exists(path):
+        return None
+    try:
+        table = pd.read_pickle(path)
+        os.utime(path)
+    except Exception as e:
+        print(f"读取缓存 {path} 时出错，将重新解析: {e}")
+        return None
+    return table
+
+
+def store(key: str, table: pd.DataFrame, cache_dir: str = None, max_bytes: int = None) -> None:
+    cache_dir = cache_dir or CACHE_DIR
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = _entry_path(key, cache_dir)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        table.to_pickle(tmp_path)
+        os.replace(tmp_path, path)  # 原子替换，多进程同时写也不会读到半个文件
+    except OSError as e:
+        print(f"写入缓存时出错，跳过缓存: {e}")
+        return
+    evict(cache_dir, max_bytes if max_bytes is not None else CACHE_MAX_BYTES)
+
+
+def evict(cache_dir: str = None, max_bytes: int = None) -> None:
+    """
+    缓存总大小超过上限时，从最久未使用的条目开始删除。
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = max_bytes if max_bytes is not None else CACHE_MAX_BYTES
+    if not os.path.isdir(cache_dir):
+        return
+    entries = []
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.name.endswith(".pkl"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # 其他进程已删除
+        total -= size
+
+
+def clear(cache_dir: str = None) -> None:
+    evict(cache_dir, 0)
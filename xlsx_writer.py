@@ -0,0 +1,266 @@
+"""
+流式写出 xlsx
+直接拼 SpreadsheetML：每行在追加时就写入临时文件，不在内存中保留整个工作簿，
+所以批注必须在追加该行时一并给出（写出后不能再回头修改单元格）。
+不经 openpyxl 的 write_only 模式：它逐格建 XML 元素，没装 lxml 时整理结果几百万个格子要写十几秒，
+这里每行拼一次字符串，文件结构（各部件、批注的 VML 形状）与 openpyxl 写出的一致。
+CommentBuilder 按 (行, 列) 先收集批注行，写出时每格只生成一次 Comment，普通工作簿和流式工作簿都可用。
+"""
+
+import datetime
+import numbers
+import re
+import shutil
+import tempfile
+import zipfile
+from collections import defaultdict
+from xml.sax.saxutils import escape, quoteattr
+
+
+# 与 openpyxl 相同：XML 不允许的控制字符
+ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+INVALID_TITLE_RE = re.compile(r"[\\*?:/\[\]]")
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_PREFIX = "application/vnd.openxmlformats-officedocument."
+
+SHEET_HEAD = (
+    f'<worksheet xmlns="{MAIN_NS}"><sheetPr><outlinePr summaryBelow="1" summaryRight="1" /><pageSetUpPr /></sheetPr>'
+    '<sheetViews><sheetView workbookViewId="0"><selection activeCell="A1" sqref="A1" /></sheetView></sheetViews>'
+    '<sheetFormatPr baseColWidth="8" defaultRowHeight="15" /><sheetData>'
+)
+SHEET_TAIL = '</sheetData><pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5" />'
+LEGACY_DRAWING = f'<legacyDrawing xmlns:r="{REL_NS}" r:id="anysvml" />'
+
+STYLES = (
+    f'<styleSheet xmlns="{MAIN_NS}"><numFmts count="0" />'
+    '<fonts count="1"><font><name val="Calibri" /><family val="2" /><color theme="1" /><sz val="11" />'
+    '<scheme val="minor" /></font></fonts>'
+    '<fills count="2"><fill><patternFill /></fill><fill><patternFill patternType="gray125" /></fill></fills>'
+    '<borders count="1"><border><left /><right /><top /><bottom /><diagonal /></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" /></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0" /></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0" /></cellStyles>'
+    '<tableStyles count="0" defaultTableStyle="TableStyleMedium9" defaultPivotStyle="PivotStyleLight16" />'
+    '</styleSheet>'
+)
+
+VML_HEAD = (
+    '<xml xmlns:v="urn:schemas-microsoft-com:vml" xmlns:o="urn:schemas-microsoft-com:office:office" '
+    'xmlns:x="urn:schemas-microsoft-com:office:excel">'
+    '<o:shapelayout v:ext="edit"><o:idmap v:ext="edit" data="1" /></o:shapelayout>'
+    '<v:shapetype id="_x0000_t202" coordsize="21600,21600" o:spt="202" path="m,l,21600r21600,l21600,xe">'
+    '<v:stroke joinstyle="miter" /><v:path gradientshapeok="t" o:connecttype="rect" /></v:shapetype>'
+)
+VML_SHAPE = (
+    '<v:shape type="#_x0000_t202" style="position:absolute; margin-left:59.25pt;margin-top:1.5pt;'
+    'width:144px;height:79px;z-index:1;visibility:hidden" fillcolor="#ffffe1" o:insetmode="auto" '
+    'id="_x0000_s{}"><v:fill color2="#ffffe1" /><v:shadow color="black" obscured="t" />'
+    '<v:path o:connecttype="none" /><v:textbox style="mso-direction-alt:auto"><div style="text-align:left" />'
+    '</v:textbox><x:ClientData ObjectType="Note"><x:MoveWithCells /><x:SizeWithCells />'
+    '<x:AutoFill>False</x:AutoFill><x:Row>{}</x:Row><x:Column>{}</x:Column></x:ClientData></v:shape>'
+)
+
+_column_letters = [""]
+
+
+def column_letter(column):
+    """
+    列号（从 1 开始）转成 A、B、…、AA，算过的留着复用
+    """
+    while len(_column_letters) <= column:
+        n, letters = len(_column_letters), ""
+        while n:
+            n, rest = divmod(n - 1, 26)
+            letters = chr(65 + rest) + letters
+        _column_letters.append(letters)
+    return _column_letters[column]
+
+
+def check_text(text):
+    if ILLEGAL_CHARACTERS_RE.search(text):
+        raise ValueError(f"{text!r} 含有不能写进工作表的控制字符")
+    return text
+
+
+def text_xml(text):
+    if check_text(text) != text.strip():
+        return f'<t xml:space="preserve">{escape(text)}</t>'
+    return f"<t>{escape(text)}</t>"
+
+
+def cell_xml(ref, value):
+    if isinstance(value, str):
+        return f'<c r="{ref}" t="inlineStr"><is>{text_xml(value)}</is></c>'
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Integral):
+        return f'<c r="{ref}" t="n"><v>{int(value)}</v></c>'
+    if isinstance(value, numbers.Real):
+        return f'<c r="{ref}" t="n"><v>{float(value)!r}</v></c>'
+    raise TypeError(f"不能写入 {type(value).__name__} 类型的值: {value!r}")
+
+
+class CommentBuilder:
+    def __init__(self, author="不羈"):
+        self.author = author
+        self._rows = defaultdict(lambda: defaultdict(list))
+
+    def add(self, row, column, text):
+        if text:
+            self._rows[row][column].append(text)
+
+    def pop_row(self, row):
+        """
+        取出某一行的批注 {列号: 文字}，供流式写出时随该行一起写入
+        """
+        columns = self._rows.pop(row, {})
+        return {column: "\n".join(lines) for column, lines in columns.items()}
+
+    def apply(self, worksheet):
+        """
+        把收集到的批注一次性挂到普通（非流式）工作表上
+        """
+        from openpyxl.comments import Comment
+
+        for row, columns in self._rows.items():
+            for column, lines in columns.items():
+                worksheet.cell(row=row, column=column).comment = Comment("\n".join(lines), self.author)
+        self._rows.clear()
+
+
+class StreamingSheet:
+    def __init__(self, title, author):
+        self.title = title
+        self.author = author
+        self.max_row = 0
+        self.comments = []  # (单元格, 行号, 列号, 批注文字)
+        self._file = tempfile.TemporaryFile()
+
+    def append(self, values, comments=None):
+        """
+        values: 一行的值
+        comments: {列号（从 1 开始）: 批注文字}，为空的批注不写
+        """
+        self.max_row += 1
+        row = self.max_row
+        # 空字符串存下来和空格子一样，不必逐格写出，整理结果大半是空格子
+        cells = [
+            cell_xml(f"{column_letter(column)}{row}", value)
+            for column, value in enumerate(values, start=1)
+            if value is not None and value != ""
+        ]
+        if comments:
+            for column, text in sorted(comments.items()):
+                if text:
+                    self.comments.append((f"{column_letter(column)}{row}", row, column, check_text(text)))
+        self._file.write(f'<row r="{row}">{"".join(cells)}</row>'.encode("utf-8"))
+
+    def _write_parts(self, zf, index):
+        """
+        写出第 index 个工作表及其批注，返回要登记到 [Content_Types].xml 的 (部件, 类型)
+        """
+        parts = [(f"/xl/worksheets/sheet{index}.xml", CT_PREFIX + "spreadsheetml.worksheet+xml")]
+        with zf.open(f"xl/worksheets/sheet{index}.xml", "w") as out:
+            out.write(SHEET_HEAD.encode("utf-8"))
+            self._file.seek(0)
+            shutil.copyfileobj(self._file, out)
+            out.write((SHEET_TAIL + (LEGACY_DRAWING if self.comments else "") + "</worksheet>").encode("utf-8"))
+        self._file.close()
+        if not self.comments:
+            return parts
+
+        with zf.open(f"xl/comments/comment{index}.xml", "w") as out:
+            out.write(f'<comments xmlns="{MAIN_NS}"><authors><author>{escape(self.author)}</author></authors>'
+                      "<commentList>".encode("utf-8"))
+            for ref, _, _, text in self.comments:
+                out.write(f'<comment ref="{ref}" authorId="0" shapeId="0"><text>{text_xml(text)}</text></comment>'
+                          .encode("utf-8"))
+            out.write(b"</commentList></comments>")
+        with zf.open(f"xl/drawings/commentsDrawing{index}.vml", "w") as out:
+            out.write(VML_HEAD.encode("utf-8"))
+            for shape_id, (_, row, column, _) in enumerate(self.comments, start=1026):
+                out.write(VML_SHAPE.format(shape_id, row - 1, column - 1).encode("utf-8"))
+            out.write(b"</xml>")
+        zf.writestr(
+            f"xl/worksheets/_rels/sheet{index}.xml.rels",
+            f'<Relationships xmlns="{PKG_REL_NS}">'
+            f'<Relationship Type="{REL_NS}/comments" Target="/xl/comments/comment{index}.xml" Id="comments" />'
+            f'<Relationship Type="{REL_NS}/vmlDrawing" Target="/xl/drawings/commentsDrawing{index}.vml" Id="anysvml" />'
+            "</Relationships>",
+        )
+        parts.append((f"/xl/comments/comment{index}.xml", CT_PREFIX + "spreadsheetml.comments+xml"))
+        return parts
+
+
+class StreamingWorkbook:
+    def __init__(self, save_path, author="不羈"):
+        self.save_path = save_path
+        self.author = author
+        self.sheets = []
+
+    def create_sheet(self, title):
+        if INVALID_TITLE_RE.search(title) or not title or len(title) > 31:
+            raise ValueError(f"工作表名不合法: {title!r}")
+        sheet = StreamingSheet(title, self.author)
+        self.sheets.append(sheet)
+        return sheet
+
+    def save(self):
+        now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        overrides = [
+            ("/xl/workbook.xml", CT_PREFIX + "spreadsheetml.sheet.main+xml"),
+            ("/xl/styles.xml", CT_PREFIX + "spreadsheetml.styles+xml"),
+            ("/docProps/core.xml", "application/vnd.openxmlformats-package.core-properties+xml"),
+        ]
+        with zipfile.ZipFile(self.save_path, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr(
+                "docProps/core.xml",
+                '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+                'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+                'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+                f"<dc:creator>{escape(self.author)}</dc:creator>"
+                f'<dcterms:created xsi:type="dcterms:W3CDTF">{now}</dcterms:created>'
+                f'<dcterms:modified xsi:type="dcterms:W3CDTF">{now}</dcterms:modified></cp:coreProperties>',
+            )
+            for index, sheet in enumerate(self.sheets, start=1):
+                overrides += sheet._write_parts(zf, index)
+            zf.writestr("xl/styles.xml", STYLES)
+            sheets = "".join(
+                f'<sheet name={quoteattr(sheet.title)} sheetId="{index}" state="visible" r:id="rId{index}" />'
+                for index, sheet in enumerate(self.sheets, start=1)
+            )
+            zf.writestr(
+                "xl/workbook.xml",
+                f'<workbook xmlns:r="{REL_NS}" xmlns="{MAIN_NS}"><workbookPr />'
+                '<bookViews><workbookView activeTab="0" /></bookViews>'
+                f'<sheets>{sheets}</sheets><calcPr calcId="124519" fullCalcOnLoad="1" /></workbook>',
+            )
+            relations = "".join(
+                f'<Relationship Type="{REL_NS}/worksheet" Target="/xl/worksheets/sheet{index}.xml" Id="rId{index}" />'
+                for index in range(1, len(self.sheets) + 1)
+            )
+            zf.writestr(
+                "xl/_rels/workbook.xml.rels",
+                f'<Relationships xmlns="{PKG_REL_NS}">{relations}'
+                f'<Relationship Type="{REL_NS}/styles" Target="styles.xml" Id="rId{len(self.sheets) + 1}" />'
+                "</Relationships>",
+            )
+            zf.writestr(
+                "_rels/.rels",
+                f'<Relationships xmlns="{PKG_REL_NS}">'
+                f'<Relationship Type="{REL_NS}/officeDocument" Target="xl/workbook.xml" Id="rId1" />'
+                f'<Relationship Type="{PKG_REL_NS}/metadata/core-properties" Target="docProps/core.xml" Id="rId2" />'
+                "</Relationships>",
+            )
+            zf.writestr(
+                "[Content_Types].xml",
+                '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml" />'
+                '<Default Extension="xml" ContentType="application/xml" />'
+                f'<Default Extension="vml" ContentType="{CT_PREFIX}vmlDrawing" />'
+                + "".join(f'<Override PartName="{part}" ContentType="{kind}" />' for part, kind in overrides)
+                + "</Types>",
+            )